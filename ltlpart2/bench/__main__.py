@@ -0,0 +1,183 @@
+import argparse;
+import copy;
+import functools;
+import json;
+import sys;
+import time;
+
+import model.buchi;
+import model.ltl;
+import model.reduction;
+
+from . import models;
+
+clock = time.perf_counter;
+
+def reach(mdl):
+    """
+    Explore the full statespace of [mdl].
+    """
+    dead = set();
+    n = sum(1 for _ in mdl.reach(dead));
+    return {"states": n, "deadlocks": len(dead)};
+
+def por(mdl):
+    """
+    Explore the statespace of [mdl] reduced by partial-order reduction.
+    """
+    dead = set();
+    n = sum(1 for _ in model.reduction.POR(mdl).reach(dead));
+    return {"states": n, "deadlocks": len(dead)};
+
+def sleep(mdl, por=False):
+    """
+    Explore the statespace of [mdl] (reduced by partial-order reduction if
+     [por] is set) with and without sleep sets, and compare the states,
+     deadlocks and transitions of both.
+    """
+    res = {};
+    for on in (False, True):
+        if(por):
+            m = model.reduction.POR(mdl, sleep=on);
+        else:
+            m = copy.copy(mdl);
+            m.sleep = on;
+
+        dead, stats = set(), {};
+        states = set(m.reach(dead, stats=stats));
+        res[on] = (states, dead, stats);
+
+    (s0, d0, t0), (s1, d1, t1) = res[False], res[True];
+    return {"states": len(s0), "deadlocks": len(d0),
+            "transitions": t0["transitions"],
+            "sleepStates": len(s1), "sleepDeadlocks": len(d1),
+            "sleepTransitions": t1["transitions"], "pruned": t1["pruned"],
+            # sleep sets alone keep every state; with POR, every deadlock
+            "kept": (d1==d0 and s1 <= s0 and (por or s1==s0))};
+
+def formula(mdl):
+    """
+    Returns the negated formula of [mdl] as an LTL expression.
+    """
+    return model.ltl.parse("not (%s)" % mdl.formula);
+
+def fromLTL(mdl):
+    """
+    Translate the negated formula of [mdl] into a Büchi automaton.
+    """
+    buchi = model.buchi.Automaton.fromLTL(formula(mdl));
+    return {"buchi": len(buchi.states)};
+
+def hasCycle(mdl):
+    """
+    Check the formula of [mdl] by searching for an accepting cycle.
+    """
+    buchi = model.buchi.Automaton.fromLTL(formula(mdl));
+    prod = model.buchi.Product(buchi, mdl);
+    cyc = prod.hasCycle();
+    return {"holds": cyc is None,
+            "trace": len(cyc) if cyc is not None else 0};
+
+tasks = {
+    "reach": reach,
+    "por": por,
+    "fromLTL": fromLTL,
+    "hasCycle": hasCycle,
+    "sleep": sleep,
+    "porSleep": functools.partial(sleep, por=True),
+};
+
+def run(name, n, task, repeat=1):
+    """
+    Run a [task] on model [name] of size [n], [repeat] times.
+    Returns a dict with the result of the task, and its best time.
+    """
+    cls = models.suite[name][0];
+    best, res = None, None;
+    for _ in range(repeat):
+        # a fresh model each run, so no state is shared between runs
+        mdl = cls(n);
+        t = clock();
+        res = tasks[task](mdl);
+        dt = clock() - t;
+        if(best is None or dt < best):
+            best = dt;
+
+    return {"model": name, "size": n, "task": task, "seconds": best,
+            **res};
+
+# result fields that may differ between runs
+volatile = {"seconds", "trace"};
+
+def compare(results, path, threshold):
+    """
+    Compare [results] to those in a JSON lines file at [path], and report
+     differing results and slowdowns beyond [threshold] to stderr.
+    Returns whether no result differs.
+    """
+    base = {};
+    with open(path) as f:
+        for line in f:
+            if(line.strip()):
+                r = json.loads(line);
+                base[(r["model"], r["size"], r["task"])] = r;
+
+    ok = True;
+    for r in results:
+        b = base.get((r["model"], r["size"], r["task"]), None);
+        if(b is None):
+            continue;
+
+        key = "%s(%d) %s" % (r["model"], r["size"], r["task"]);
+        for k, v in r.items():
+            if(k not in volatile and b.get(k, v)!=v):
+                print("%s: %s changed from %r to %r" % (key, k, b[k], v),
+                      file=sys.stderr);
+                ok = False;
+
+        if(b["seconds"] and r["seconds"] / b["seconds"] > threshold):
+            print("%s: %.3fs, was %.3fs (%.2fx)" % (
+                    key, r["seconds"], b["seconds"],
+                    r["seconds"] / b["seconds"]), file=sys.stderr);
+
+    return ok;
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench",
+                                     description="Run model benchmarks.");
+    parser.add_argument("-m", "--model", action="append",
+                        choices=sorted(models.suite),
+                        help="model to run (default: all)");
+    parser.add_argument("-n", "--size", action="append", type=int,
+                        help="model size (default: per model)");
+    parser.add_argument("-t", "--task", action="append",
+                        choices=list(tasks),
+                        help="task to run (default: all)");
+    parser.add_argument("-r", "--repeat", type=int, default=1,
+                        help="runs per benchmark; the best time is kept");
+    parser.add_argument("-o", "--output", default="-",
+                        help="JSON lines output file (default: stdout)");
+    parser.add_argument("-c", "--compare",
+                        help="JSON lines file of an earlier run to compare to");
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio reported when comparing");
+    args = parser.parse_args();
+
+    out = sys.stdout if args.output=="-" else open(args.output, "w");
+    results = [];
+    for name in args.model or sorted(models.suite):
+        for n in args.size or models.suite[name][1]:
+            for task in args.task or list(tasks):
+                r = run(name, n, task, args.repeat);
+                results.append(r);
+                out.write(json.dumps(r) + "\n");
+                out.flush();
+
+    if(out is not sys.stdout):
+        out.close();
+
+    if(args.compare and not compare(results, args.compare, args.threshold)):
+        sys.exit(1);
+
+if(__name__=="__main__"):
+    main();
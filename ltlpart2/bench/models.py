@@ -0,0 +1,302 @@
+import model;
+import model.slotState;
+
+from model.util import cached_property;
+
+class State(model.slotState.SlotState):
+    """
+    State object for benchmark models.
+    """
+    @cached_property
+    def labels(self):
+        """
+        Returns a set of all state labels applicable in this state.
+        """
+        slots = self.slots;
+        return {lbl for lbl, fn in self.model.guards if fn(slots)};
+
+    @cached_property
+    def labelMask(self):
+        """
+        Returns the state labels applicable in this state as a bitmask of
+         their bits.
+        """
+        # guard bits are distinct, so their sum is their union
+        slots = self.slots;
+        return sum([lbl.bit for lbl, fn in self.model.guards if fn(slots)]);
+
+class Model(model.Model):
+    """
+    Table-driven benchmark model object.
+
+    Subclasses declare their slots, guards (state labels) and actions in their
+     constructor; guards and actions also declare the slots they test, read
+     and write, which is used for partial-order reduction.
+    """
+    # LTL formula checked by the benchmark harness
+    formula = None;
+
+    def __init__(self, n):
+        super().__init__();
+        self.n = n;
+        self.name = "%s(%d)" % (type(self).__name__, n);
+
+        self.names = [];
+        self.guards = [];
+        self.transitions = [];
+        self.init = [];
+
+    def slot(self, name, v=0):
+        """
+        Add a slot [name] with initial value [v].
+        Returns the index of the slot.
+        """
+        self.names.append(name);
+        self.init.append(v);
+        return len(self.names) - 1;
+
+    def guard(self, name, tests, fn):
+        """
+        Add a guard [name] that tests the slots [tests], and holds if [fn]
+         returns True for the list of slot values.
+        Returns the state label of the guard.
+        """
+        self.labels.add(name, {"tests": tests});
+        lbl = self.labels[name];
+        self.guards.append((lbl, fn));
+        return lbl;
+
+    def action(self, name, guards, reads, writes, fn):
+        """
+        Add an action [name], enabled if all [guards] hold, that reads slots
+         [reads] and writes slots [writes] by calling [fn] with the list of
+         slot values of the successor state.
+        """
+        self.actions.add(name, {"reads": reads, "writes": writes});
+        act = self.actions[name];
+        act.guards = set(guards);
+        self.transitions.append((act, fn));
+
+    def start(self):
+        """
+        Create the initial state, after all slots have been added.
+        """
+        self.initialState = State(self, self.names, list(self.init));
+
+    def nextStates(self, src):
+        """
+        Returns for each successor state of [src] a tuple consisting of the
+         state object and the action used to get there.
+        """
+        off = ~src.labelMask;
+        for act, fn in self.transitions:
+            if(act.guardMask & off):
+                continue;
+
+            dst = State(self, self.names, list(src.slots));
+            fn(dst.slots);
+            yield (dst, act);
+
+    def nextStatesFor(self, src, mask):
+        """
+        Returns for each successor state of [src] by one of the actions in the
+         bitmask [mask] a tuple consisting of the state object and the action
+         used to get there.
+        """
+        off = ~src.labelMask;
+        res = [];
+        for act, fn in self.transitions:
+            if(not act.bit & mask or act.guardMask & off):
+                continue;
+
+            dst = State(self, self.names, list(src.slots));
+            fn(dst.slots);
+            res.append((dst, act));
+        return res;
+
+class Philosophers(Model):
+    """
+    Dining philosophers: [n] philosophers around a table, each picking up
+     their left fork and then their right fork. Deadlocks when all of them hold
+     their left fork.
+    """
+    @property
+    def formula(self):
+        return " and ".join("globally finally eat%d" % i
+                            for i in range(self.n));
+
+    def __init__(self, n):
+        super().__init__(n);
+
+        THINK, LEFT, EAT = 0, 1, 2;
+        phil = [self.slot("phil%d" % i, THINK) for i in range(n)];
+        fork = [self.slot("fork%d" % i, 0) for i in range(n)];
+
+        for i in range(n):
+            p, l, r = phil[i], fork[i], fork[(i + 1) % n];
+            pn, ln, rn = self.names[p], self.names[l], self.names[r];
+
+            think = self.guard("think%d" % i, [pn],
+                               lambda s, p=p: s[p]==THINK);
+            self.guard("left%d" % i, [pn],
+                       lambda s, p=p: s[p]==LEFT);
+            eat = self.guard("eat%d" % i, [pn],
+                             lambda s, p=p: s[p]==EAT);
+            free = self.guard("free%d" % i, [ln],
+                              lambda s, l=l: s[l]==0);
+
+            def takeLeft(s, p=p, l=l):
+                s[p], s[l] = LEFT, 1;
+
+            def release(s, p=p, l=l, r=r):
+                s[p], s[l], s[r] = THINK, 0, 0;
+
+            self.action("takeLeft%d" % i, [think, free], [pn, ln], [pn, ln],
+                        takeLeft);
+            self.action("release%d" % i, [eat], [pn], [pn, ln, rn],
+                        release);
+
+        # the right fork is the left fork of the next philosopher
+        for i in range(n):
+            p, r = phil[i], fork[(i + 1) % n];
+            pn, rn = self.names[p], self.names[r];
+
+            def takeRight(s, p=p, r=r):
+                s[p], s[r] = EAT, 1;
+
+            self.action("takeRight%d" % i,
+                        [self.labels["left%d" % i],
+                         self.labels["free%d" % ((i + 1) % n)]],
+                        [pn, rn], [pn, rn], takeRight);
+
+        self.start();
+
+class LeaderElection(Model):
+    """
+    Leader election on a unidirectional ring of [n] nodes (Chang-Roberts):
+     each node forwards the largest identifier it has seen, and the node that
+     receives its own identifier becomes the leader.
+    """
+    formula = "finally leader0";
+
+    def __init__(self, n):
+        super().__init__(n);
+
+        ids = [n - i for i in range(n)];
+        best = [self.slot("best%d" % i, ids[i]) for i in range(n)];
+        send = [self.slot("send%d" % i, 1) for i in range(n)];
+        chan = [self.slot("chan%d" % i, 0) for i in range(n)];
+        lead = [self.slot("leader%d" % i, 0) for i in range(n)];
+
+        for i in range(n):
+            self.guard("leader%d" % i, [self.names[lead[i]]],
+                       lambda s, x=lead[i]: s[x]==1);
+
+        for i in range(n):
+            b, sd, c = best[i], send[i], chan[i];
+            pc = chan[(i - 1) % n];
+            bn, sn, cn = self.names[b], self.names[sd], self.names[c];
+            pn, ln = self.names[pc], self.names[lead[i]];
+
+            pending = self.guard("send%d" % i, [sn],
+                                 lambda s, x=sd: s[x]==1);
+            empty = self.guard("empty%d" % i, [cn],
+                               lambda s, x=c: s[x]==0);
+            full = self.guard("full%d" % i, [pn],
+                              lambda s, x=pc: s[x]!=0);
+
+            def forward(s, b=b, sd=sd, c=c):
+                s[c], s[sd] = s[b], 0;
+
+            def receive(s, b=b, sd=sd, pc=pc, l=lead[i], id=ids[i]):
+                v, s[pc] = s[pc], 0;
+                if(v > s[b]):
+                    s[b], s[sd] = v, 1;
+                elif(v==id):
+                    s[l] = 1;
+
+            self.action("forward%d" % i, [pending, empty], [bn, sn, cn],
+                        [sn, cn], forward);
+            self.action("receive%d" % i, [full], [pn, bn],
+                        [pn, bn, sn, ln], receive);
+
+        self.start();
+
+class CounterRing(Model):
+    """
+    Ring of [n] independent counters modulo [k]. Its statespace is the full
+     product of all counters, which partial-order reduction collapses.
+    """
+    @property
+    def formula(self):
+        return " and ".join("globally finally zero%d" % i
+                            for i in range(self.n));
+
+    def __init__(self, n, k=3):
+        super().__init__(n);
+
+        for i in range(n):
+            c = self.slot("c%d" % i, 0);
+            cn = self.names[c];
+            self.guard("zero%d" % i, [cn], lambda s, c=c: s[c]==0);
+
+            def inc(s, c=c):
+                s[c] = (s[c] + 1) % k;
+
+            self.action("inc%d" % i, [], [cn], [cn], inc);
+
+        self.start();
+
+class Stoplights(Model):
+    """
+    Ring of [n] traffic lights, of which neighbouring lights may not be green
+     (or yellow) at the same time.
+    """
+    @property
+    def formula(self):
+        return " and ".join("globally finally green%d" % i
+                            for i in range(self.n));
+
+    def __init__(self, n):
+        super().__init__(n);
+
+        RED, GREEN, YELLOW = 0, 1, 2;
+        light = [self.slot("light%d" % i, RED) for i in range(n)];
+
+        red = [self.guard("red%d" % i, [self.names[x]],
+                          lambda s, x=x: s[x]==RED)
+               for i, x in enumerate(light)];
+
+        for i, x in enumerate(light):
+            xn = self.names[x];
+            green = self.guard("green%d" % i, [xn],
+                               lambda s, x=x: s[x]==GREEN);
+            yellow = self.guard("yellow%d" % i, [xn],
+                                lambda s, x=x: s[x]==YELLOW);
+
+            def go(s, x=x):
+                s[x] = GREEN;
+
+            def slow(s, x=x):
+                s[x] = YELLOW;
+
+            def stop(s, x=x):
+                s[x] = RED;
+
+            # neighbours must be red
+            near = {red[i], red[(i - 1) % n], red[(i + 1) % n]};
+            self.action("go%d" % i, near,
+                        [self.names[light[j]] for j in
+                         {i, (i - 1) % n, (i + 1) % n}], [xn], go);
+            self.action("slow%d" % i, [green], [xn], [xn], slow);
+            self.action("stop%d" % i, [yellow], [xn], [xn], stop);
+
+        self.start();
+
+# models by name, with their default sizes
+suite = {
+    "philosophers": (Philosophers, [4, 6, 8]),
+    "leader": (LeaderElection, [4, 5, 6]),
+    "counters": (CounterRing, [4, 6, 8]),
+    "stoplights": (Stoplights, [4, 6, 8]),
+};
@@ -0,0 +1,90 @@
+import argparse;
+import json;
+import sys;
+import time;
+
+import model.pins;
+from model.pins import callback;
+
+clock = time.perf_counter;
+
+def inPlace(mdl, states):
+    """
+    Generate the successors of [states] as views of the successor buffers.
+    """
+    return sum(1 for src in states for _ in mdl.successors(src));
+
+def arena(mdl, states):
+    """
+    Generate the successors of [states] as offsets into one block per state.
+    """
+    return sum(len(mdl.nextStatesArena(src)[1]) for src in states);
+
+def batch(mdl, states):
+    """
+    Generate the successors of [states] as ctypes arrays.
+    """
+    return sum(len(mdl.nextStatesBatch(src)) for src in states);
+
+def generator(cls):
+    """
+    Returns a method generating successors through the per-transition
+     callback, converted by the CallbackGenerator [cls].
+    """
+    def run(mdl, states):
+        n = 0;
+        for src in states:
+            gen = cls(lambda cb, src=src: mdl.nextStates(src, cb));
+            n += sum(1 for _ in gen);
+        return n;
+    return run;
+
+methods = {
+    "inPlace": inPlace,
+    "arena": arena,
+    "batch": batch,
+    "fallback": generator(callback.fallback),
+};
+if(callback.CallbackGenerator.name=="greenlet"):
+    methods["greenlet"] = generator(callback.CallbackGenerator);
+
+def run(lib, method, states, repeat=1):
+    """
+    Generate the successors of all [states] of a PINS model [lib] with a
+     successor [method], [repeat] times.
+    Returns a dict with the amount of transitions, and the best time.
+    """
+    mdl = lib.model;
+    slots = [src.slots for src in states];
+    best, n = None, 0;
+    for _ in range(repeat):
+        t = clock();
+        n = methods[method](mdl, slots);
+        dt = clock() - t;
+        if(best is None or dt < best):
+            best = dt;
+
+    return {"model": lib.name, "size": len(states), "task": method,
+            "seconds": best, "transitions": n};
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.successors",
+            description="Compare the successor generation methods of a PINS "
+                        "model on its reachable states.");
+    parser.add_argument("lib", help="PINS model library");
+    parser.add_argument("-t", "--task", action="append",
+                        choices=list(methods),
+                        help="method to run (default: all)");
+    parser.add_argument("-r", "--repeat", type=int, default=1,
+                        help="runs per method; the best time is kept");
+    args = parser.parse_args();
+
+    lib = model.pins.Model(args.lib);
+    states = list(lib.reach());
+    for method in args.task or list(methods):
+        r = run(lib, method, states, args.repeat);
+        sys.stdout.write(json.dumps(r) + "\n");
+        sys.stdout.flush();
+
+if(__name__=="__main__"):
+    main();
@@ -0,0 +1,167 @@
+from . import util;
+
+# Holzmann, G. J. "An Analysis of Bitstate Hashing". Formal Methods in System
+# Design, vol. 13, issue 3 (1998): 289--307.
+
+MASK64 = (1 << 64) - 1;
+
+def hashes(item, k, mask):
+    """
+    Returns [k] positions (within [mask]) for a given [item], using double
+     hashing on the item's hash.
+    """
+    h = hash(item) & MASK64;
+
+    # second hash: splitmix64 finalizer, forced to be odd
+    g = util.mix64(h) | 1;
+
+    return [(h + i * g) & mask for i in range(k)];
+
+class BitStateSet(object):
+    """
+    Bitstate (supertrace) state set object.
+
+    Each state is represented by [k] bits in a table of [2**bits] bits. A state
+     is considered visited if all of its bits are set, so states may be missed
+     through hash collisions. The set only supports adding states and testing
+     membership: it cannot be iterated, nor can states be removed from it.
+
+    Use functools.partial to configure a set for Model.StateSet.
+    """
+    def __init__(self, bits=27, k=3):
+        self.size = 1 << bits;
+        self.mask = self.size - 1;
+        self.k = k;
+        self.data = bytearray(self.size >> 3);
+
+        self.count = 0;
+        self.ones = 0;
+
+        # expected amount of states missed through hash collisions
+        self.omitted = 0.0;
+
+    def __len__(self):
+        return self.count;
+
+    def __contains__(self, item):
+        data = self.data;
+        for i in hashes(item, self.k, self.mask):
+            if(not data[i >> 3] & (1 << (i & 7))):
+                return False;
+        return True;
+
+    def add(self, item):
+        """
+        Add a given state [item] to this set.
+        """
+        # probability that this state would have been missed
+        p = (self.ones / self.size) ** self.k;
+
+        data, new = self.data, False;
+        for i in hashes(item, self.k, self.mask):
+            b, m = data[i >> 3], 1 << (i & 7);
+            if(not b & m):
+                data[i >> 3] = b | m;
+                self.ones += 1;
+                new = True;
+
+        if(new):
+            self.count += 1;
+            self.omitted += p;
+
+    def report(self):
+        """
+        Returns a dict with the estimated coverage of this set.
+        """
+        fill = self.ones / self.size;
+        return {
+            "states": self.count,
+            "bits": self.size,
+            "hashes": self.k,
+            "fill": fill,
+            "collision": fill ** self.k,
+            "omitted": self.omitted,
+            "coverage": self.count / ((self.count + self.omitted) or 1),
+        };
+
+class BitStateMap(object):
+    """
+    Bitstate map object, mapping states to small values (below 4).
+
+    Each state is represented by [k] 2-bit cells in a table of [2**bits]
+     cells. Values may only increase: setting a value keeps the maximum in
+     each cell, and getting it returns the minimum over all of the state's
+     cells. This suits the blue and red colors of a nested depth-first
+     search; a collision may then make an unvisited state seem visited, but
+     the states on the search stack are kept exactly (see
+     buchi.Product.hasCycle).
+    """
+    def __init__(self, bits=27, k=3):
+        self.size = 1 << bits;
+        self.mask = self.size - 1;
+        self.k = k;
+        self.data = bytearray(self.size >> 2);
+
+        self.count = 0;
+        self.used = 0;
+        self.omitted = 0.0;
+
+    def __len__(self):
+        return self.count;
+
+    def get(self, item, default=0):
+        """
+        Returns the value for a state [item], or [default] if it has none.
+        """
+        data, v = self.data, 3;
+        for i in hashes(item, self.k, self.mask):
+            c = (data[i >> 2] >> ((i & 3) << 1)) & 3;
+            if(c < v):
+                v = c;
+                if(v==0):
+                    return default;
+        return v;
+
+    def __getitem__(self, item):
+        v = self.get(item, None);
+        if(v is None):
+            raise KeyError(item);
+        return v;
+
+    def __setitem__(self, item, v):
+        assert(0 <= v <= 3);
+        # probability that a new state would already seem to have a value
+        p = (self.used / self.size) ** self.k;
+
+        data, prev = self.data, 3;
+        for i in hashes(item, self.k, self.mask):
+            s = (i & 3) << 1;
+            b = data[i >> 2];
+            c = (b >> s) & 3;
+            if(c < prev):
+                prev = c;
+            if(v <= c):
+                continue;
+
+            if(c==0):
+                self.used += 1;
+            data[i >> 2] = (b & ~(3 << s)) | (v << s);
+
+        if(prev==0 and v > 0):
+            self.count += 1;
+            self.omitted += p;
+
+    def report(self):
+        """
+        Returns a dict with the estimated coverage of this map.
+        """
+        fill = self.used / self.size;
+        return {
+            "states": self.count,
+            "cells": self.size,
+            "hashes": self.k,
+            "fill": fill,
+            "collision": fill ** self.k,
+            "omitted": self.omitted,
+            "coverage": self.count / ((self.count + self.omitted) or 1),
+        };
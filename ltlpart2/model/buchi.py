@@ -1,5 +1,8 @@
+import copy;
+
 from . import ltl;
 from . import model;
+from . import profile;
 
 # Gerth, R.; Peled, D.; Varde, M. Y. et al. "Simple On-the-fly Automatic
 # Verification of Linear Temporal Logic". IFIP Advances in Information and
@@ -240,6 +243,9 @@ class Product(model.Model):
             yield self.mState;
             yield self.count;
 
+        def __hash__(self):
+            return hash((self.bState, self.mState, self.count));
+
         def __repr__(self):
             return "Product.State(%s, %s, %s)" \
                     % (self.bState, self.mState, self.count);
@@ -264,16 +270,53 @@ class Product(model.Model):
             """
             return self.model.labels["accept"] in self.labels;
 
+    ColorMap = dict;
+
     def __init__(self, buchi, model):
         super().__init__();
 
+        if(getattr(model, "sleep", False)):
+            raise ValueError("sleep sets are not supported in a product");
+
         self.buchi = buchi;
         self.model = model;
 
+        # label bitmasks of the model for each Büchi state (see _masks)
+        self._bmasks = {};
+
         self.labels.add("accept");
 
         self.initialState = None;
 
+    def _masks(self, b):
+        """
+        Returns for a Büchi state [b] a tuple consisting of the bitmasks of
+         the model labels that must hold, and those that must not hold.
+        """
+        masks = self._bmasks.get(b, None);
+        if(masks is not None):
+            return masks;
+
+        labels = self.model.labels.data;
+        pos, neg = 0, 0;
+        for l in b.labels:
+            if(l.op=="value"):
+                lbl = labels.get(l.args[0], None);
+                # a label unknown to the model never holds; require all bits
+                #  so that no state mask can match
+                pos |= lbl.bit if lbl is not None else -1;
+
+            elif(l.op=="not"):
+                lbl = labels.get(l.args[0].args[0], None);
+                if(lbl is not None):
+                    neg |= lbl.bit;
+
+            else:
+                raise NotImplementedError;
+
+        masks = self._bmasks[b] = (pos, neg);
+        return masks;
+
     def nextStates(self, src):
         """
         Returns for each successor state of [src] a tuple consisting of the
@@ -292,21 +335,43 @@ class Product(model.Model):
 
         # product has (q, s) ={a}> (p, t) if s ={a}> t and q ={L(t)}> p
         accepts = self.buchi.accept;
-        for s, a in nextStates:
-            lbl = set(l.id for l in s.labels);
-
-            for b in outgoing:
-                if(not b.eval(lbl)):
-                    continue;
+        prof = self.profile;
+        out = [(b, *self._masks(b)) for b in outgoing];
+
+        # evaluate the labels of all successors at once
+        nextStates = list(nextStates);
+        if(prof is not None):
+            t = profile.clock();
+        masks = self.model.labelMasks([s for s, _ in nextStates]);
+        if(prof is not None):
+            prof.time("labels", profile.clock() - t, len(masks));
+
+        for (s, a), m in zip(nextStates, masks):
+            if(prof is not None):
+                t = profile.clock();
+                match = [b for b, pos, neg in out
+                         if (m & pos)==pos and not (m & neg)];
+                prof.time("buchi", profile.clock() - t);
+            else:
+                match = [b for b, pos, neg in out
+                         if (m & pos)==pos and not (m & neg)];
 
+            for b in match:
                 if(b in accepts[count]):
                     count = (count + 1) % len(accepts);
 
                 yield (Product.State(self, b, s, count), a);
 
-    def hasCycle(self):
+    def hasCycle(self, stats=None, checkpoint=None):
         """
-        Determine whether this Büchi automaton has an accepting cycle.
+        Determine whether this Büchi automaton has an accepting cycle. If the
+         color map can report on its coverage, its report is added to the dict
+         [stats].
+        If a [checkpoint] is given, the search is resumed from it when it
+         exists, and it is written periodically.
+        Sleep sets are not used: a transition pruned by a sleep set may close
+         the only accepting cycle, so the product refuses models with [sleep]
+         set.
         Returns the cycle,
          or None if no such cycle exists.
         """
@@ -316,57 +381,151 @@ class Product(model.Model):
             BLUE  = 2;
             RED   = 3;
 
-        # the stack is managed manually for easy return of cycles
+        # phases of a search frame
+        BLUE, RED, DONE = 0, 1, 2;
+
+        # the stack is managed manually for easy return of cycles; the states
+        #  on the blue stack (cyan) are kept exactly, apart from the other
+        #  colors, so that a lossy color map cannot report a false cycle
         stack = [];
-        color = {};
+        cyan = set();
+        color = self.ColorMap();
+
+        # for each state on the stack: its phase, and the successors left
+        #  (in reverse order)
+        frames = [];
+        roots = [i for i, _ in self.nextStates(self.initialState)];
+        roots.reverse();
+        count = 0;
+
+        prod = self;
+        if(checkpoint is not None and checkpoint.exists()):
+            # states refer to the automaton stored with them; resume on a copy
+            #  of this product using that automaton, so this one is unchanged
+            prod = copy.copy(self);
+            prod._bmasks = {};
+            data = checkpoint.load(prod);
+            prod.buchi = data["buchi"];
+            stack, color = data["stack"], data["color"];
+            cyan = data["cyan"];
+            frames, roots = data["frames"], data["roots"];
+            count = data["count"];
+
+        nextStates, colors = prod.nextStates, color;
+        prof = self.profile;
+        if(prof is not None):
+            prof.start();
+            nextStates = prof.nextStates(nextStates);
+            color = prof.lookups(colors);
+
+        def succ(s):
+            l = [t for t, _ in nextStates(s)];
+            l.reverse();
+            return l;
 
         def blue(s):
             stack.append(s);
-            """
-            TODO (LTL lab): implement blue phase of NDFS.
-
-            Tip: you can use `color.get(node, Color.WHITE)` to get the color
-            of a given `node`, or the default value "white" if that node hasn't
-            been colored yet.
-            """
-
-            color[s] = Color.CYAN
-
-            for t,_ in self.nextStates(s):
-                if((color.get(t, Color.WHITE) is Color.CYAN) 
-                   and (s.accepting or t.accepting)):
-                    raise AssertionError("report cycle")
-
-                if color.get(t, Color.WHITE) is Color.WHITE:
-                    blue(t)
-
-            if s.accepting:
-                red(s)
-                color[s] = Color.RED
-            else:
-                color[s] = Color.BLUE
-
-            stack.pop();
+            cyan.add(s);
+            frames.append([BLUE, succ(s)]);
+            if(prof is not None):
+                prof.visit(len(frames[-1][1]), len(frames));
 
         def red(s):
             stack.append(s);
-            """
-            TODO (LTL lab): implement red phase of NDFS.
-            """
-
-            for t,_ in self.nextStates(s):
-                if(color.get(t, Color.WHITE) is Color.CYAN):
-                    raise AssertionError("report cycle")
-                if color.get(t, Color.WHITE) is Color.BLUE:
-                    color[t] = Color.RED
-                    red(t)
+            frames.append([RED, succ(s)]);
+
+        def report():
+            if(stats is not None and hasattr(colors, "report")):
+                stats.update(colors.report());
+            if(prof is not None):
+                prof.finish();
+
+        while frames or roots:
+            if(not frames):
+                blue(roots.pop());
+                continue;
+
+            s = stack[-1];
+            frame = frames[-1];
+            phase, todo = frame;
+
+            if(phase==BLUE and todo):
+                """
+                TODO (LTL lab): implement blue phase of NDFS.
+
+                Tip: you can use `color.get(node, Color.WHITE)` to get the color
+                of a given `node`, or the default value "white" if that node hasn't
+                been colored yet.
+                BEGIN-CUT-CODE
+                """
+                t = todo.pop();
+                c = color.get(t, Color.WHITE);
+                if(c is Color.WHITE and t in cyan):
+                    c = Color.CYAN;
+                if(c is Color.CYAN and (s.accepting or t.accepting)):
+                    # report cycle
+                    report();
+                    return stack;
+
+                if(c is Color.WHITE):
+                    blue(t);
+
+                    count += 1;
+                    if(checkpoint is not None and checkpoint.due(count)):
+                        checkpoint.save(prod, count, {
+                            "count": count, "buchi": prod.buchi,
+                            "stack": stack, "color": colors, "cyan": cyan,
+                            "frames": frames, "roots": roots});
+                """
+                END-CUT-CODE
+                """
+
+            elif(phase==BLUE):
+                """
+                TODO (LTL lab): backtrack from the blue phase of NDFS.
+                BEGIN-CUT-CODE
+                """
+                if(s.accepting):
+                    # start the red search; color red once it returns
+                    frame[0] = DONE;
+                    red(s);
+                    continue;
 
-            stack.pop();
+                cyan.discard(s);
+                color[s] = Color.BLUE;
+                stack.pop();
+                frames.pop();
+                """
+                END-CUT-CODE
+                """
+
+            elif(phase==RED and todo):
+                """
+                TODO (LTL lab): implement red phase of NDFS.
+                BEGIN-CUT-CODE
+                """
+                t = todo.pop();
+                c = color.get(t, Color.WHITE);
+                if(c is Color.WHITE and t in cyan):
+                    c = Color.CYAN;
+                if(c is Color.CYAN):
+                    # report cycle
+                    report();
+                    return stack;
+
+                if(c is Color.BLUE):
+                    color[t] = Color.RED;
+                    red(t);
+                """
+                END-CUT-CODE
+                """
 
-        for i, _ in self.nextStates(self.initialState):
-            try:
-                blue(i);
-            except AssertionError:
-                return stack;
+            else:
+                if(phase==DONE):
+                    cyan.discard(s);
+                    color[s] = Color.RED;
+                stack.pop();
+                frames.pop();
 
+        report();
         return None;
@@ -0,0 +1,95 @@
+import os;
+import time;
+import zlib;
+
+from . import util;
+
+def _refs(mdl):
+    """
+    Returns the list of model objects used by a model [mdl], which are stored
+     by reference in a checkpoint.
+    """
+    refs, todo = [], [mdl];
+    while todo:
+        m = todo.pop();
+        if(m is None or any(m is r for r in refs)):
+            continue;
+        refs.append(m);
+
+        # wrapped models (e.g. the model of a product)
+        todo.append(getattr(m, "model", None));
+        # reduced models use the nextStates of the original model
+        todo.append(getattr(getattr(m, "nextStates", None), "__self__", None));
+
+    return refs;
+
+class Checkpoint(object):
+    """
+    Checkpoint object for long-running explorations.
+
+    A checkpoint is written to [path] (as a compressed pickle) at most every
+     [interval] seconds, or every [states] states, whichever comes first. The
+     models themselves are not stored: a checkpoint is resumed by passing it
+     again to the same exploration of the same model.
+    """
+    def __init__(self, path, interval=None, states=None):
+        self.path = path;
+        self.interval = interval;
+        self.states = states;
+
+        self.time = time.monotonic();
+        self.count = 0;
+
+    def exists(self):
+        """
+        Returns whether a checkpoint has been written.
+        """
+        return os.path.exists(self.path);
+
+    def due(self, count):
+        """
+        Returns whether a new checkpoint should be written after [count]
+         states.
+        """
+        if(self.states is not None and count - self.count >= self.states):
+            return True;
+        if(self.interval is not None and
+           time.monotonic() - self.time >= self.interval):
+            return True;
+        return False;
+
+    def save(self, mdl, count, data):
+        """
+        Write a checkpoint of a dict [data] for an exploration of a model [mdl]
+         after [count] states.
+        """
+        buf = zlib.compress(util.dumps(data, _refs(mdl)));
+
+        # replace the previous checkpoint atomically
+        tmp = self.path + ".tmp";
+        with open(tmp, "wb") as f:
+            f.write(buf);
+            f.flush();
+            os.fsync(f.fileno());
+        os.replace(tmp, self.path);
+
+        self.time = time.monotonic();
+        self.count = count;
+
+    def load(self, mdl):
+        """
+        Returns the dict stored in the checkpoint for a model [mdl].
+        """
+        with open(self.path, "rb") as f:
+            data = util.loads(zlib.decompress(f.read()), _refs(mdl));
+
+        self.time = time.monotonic();
+        self.count = data["count"];
+        return data;
+
+    def remove(self):
+        """
+        Remove the checkpoint.
+        """
+        if(self.exists()):
+            os.remove(self.path);
@@ -0,0 +1,128 @@
+import array;
+import math;
+
+# Wolper, P.; Leroy, D. "Reliable Hashing without Collision Detection".
+# Lecture Notes in Computer Science, vol. 697 (1993): 59--70.
+
+class HashCompactSet(object):
+    """
+    Hash compaction state set object.
+
+    Only a 64-bit fingerprint of each state (see State.fingerprint) is stored,
+     in an open-addressing table of integers. Two states with the same
+     fingerprint are considered equal, so states may be missed. The set only
+     supports adding states and testing membership: it cannot be iterated,
+     nor can states be removed from it.
+
+    Use functools.partial to configure a set for Model.StateSet.
+    """
+    def __init__(self, capacity=1 << 16):
+        """
+        Create a set with an initial [capacity] (a power of two).
+        """
+        # 0 marks an empty slot
+        self.table = array.array("Q", bytes(8 * capacity));
+        self.mask = capacity - 1;
+        self.count = 0;
+
+    def __len__(self):
+        return self.count;
+
+    @staticmethod
+    def _key(item):
+        """
+        Returns the (nonzero) fingerprint of a state [item].
+        """
+        return item.fingerprint() or 1;
+
+    def _probe(self, key):
+        """
+        Returns the table slot for a fingerprint [key].
+        """
+        table, mask = self.table, self.mask;
+        i = key & mask;
+        while(table[i]!=0 and table[i]!=key):
+            i = (i + 1) & mask;
+        return i;
+
+    def _grow(self):
+        """
+        Double the size of the table.
+        """
+        old = self.table;
+        self.table = array.array("Q", bytes(16 * len(old)));
+        self.mask = len(self.table) - 1;
+        for key in old:
+            if(key!=0):
+                self.table[self._probe(key)] = key;
+
+    def __contains__(self, item):
+        key = self._key(item);
+        return self.table[self._probe(key)]==key;
+
+    def add(self, item):
+        """
+        Add a given state [item] to this set.
+        """
+        key = self._key(item);
+        i = self._probe(key);
+        if(self.table[i]==key):
+            return;
+
+        self.table[i] = key;
+        self.count += 1;
+
+        # keep the table at most three quarters full
+        if(4 * self.count > 3 * len(self.table)):
+            self._grow();
+
+    def report(self):
+        """
+        Returns a dict with the omission probability of this set.
+        """
+        n = self.count;
+        # probability of any fingerprint collision among n states
+        p = -math.expm1(-n * (n - 1) / 2.0 ** 65);
+        return {
+            "states": n,
+            "bytes": 8 * len(self.table),
+            "omission": p,
+        };
+
+class FingerprintMap(object):
+    """
+    Hash compaction map object, mapping states to values.
+
+    Only the 64-bit fingerprint of each state (see State.fingerprint) is kept
+     as its key, as in HashCompactSet, so states with the same fingerprint
+     share their value.
+
+    Use as Model.SleepMap next to a HashCompactSet or a bitstate.BitStateSet.
+    """
+    def __init__(self):
+        self.data = {};
+
+    def __len__(self):
+        return len(self.data);
+
+    def __contains__(self, item):
+        return item.fingerprint() in self.data;
+
+    def __getitem__(self, item):
+        return self.data[item.fingerprint()];
+
+    def __setitem__(self, item, v):
+        self.data[item.fingerprint()] = v;
+
+    def get(self, item, default=None):
+        """
+        Returns the value for a state [item], or [default] if it has none.
+        """
+        return self.data.get(item.fingerprint(), default);
+
+    def pop(self, item, default=None):
+        """
+        Remove a state [item], and return its value (or [default] if it has
+         none).
+        """
+        return self.data.pop(item.fingerprint(), default);
@@ -0,0 +1,175 @@
+import heapq;
+import itertools;
+import mmap;
+import os;
+import sys;
+import tempfile;
+
+# Korf, R. E. "Delayed Duplicate Detection: Extended Abstract". Proceedings of
+# the 18th International Joint Conference on Artificial Intelligence (2003):
+# 1539--1541.
+
+def _records(path, size):
+    """
+    Returns each record of [size] bytes in the file at [path].
+    """
+    with open(path, "rb") as f:
+        if(os.fstat(f.fileno()).st_size==0):
+            return;
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for off in range(0, len(mm), size):
+                yield mm[off:off + size];
+
+def _unique(records):
+    """
+    Returns each record of the sorted [records] once.
+    """
+    prev = None;
+    for r in records:
+        if(r!=prev):
+            yield r;
+        prev = r;
+
+class Reach(object):
+    """
+    External-memory reachability object.
+
+    The statespace of a [model] is explored breadth-first, while the visited
+     set and the frontier are kept in files on disk. States must be packable
+     (see Model.pack). Duplicate detection is delayed until the end of each
+     level: the successors of a level are collected in sorted runs that take
+     at most [budget] bytes of memory each (counting the overhead of each
+     buffered state), which are then merged with the sorted visited file in
+     one sequential pass.
+    """
+    def __init__(self, model, budget=1 << 26, dir=None, chunk=1024):
+        """
+        Create an external exploration of a [model], using at most [budget]
+         bytes of memory for successor states, and temporary files in [dir].
+         Frontier states are expanded [chunk] states at a time.
+        """
+        assert(model.stateSize is not None);
+        self.model = model;
+        self.budget = budget;
+        self.dir = dir;
+        self.chunk = chunk;
+
+    def __iter__(self):
+        return self.run();
+
+    def run(self, dead=None, live=None, levels=None):
+        """
+        Iterate through reachable statespace, one breadth-first level at a
+         time. Adds deadlock states to [dead], livelock states to [live], and
+         the size of each level to [levels].
+        Returns each reachable state.
+        """
+        mdl = self.model;
+        with tempfile.TemporaryDirectory(dir=self.dir) as tmp:
+            visited = os.path.join(tmp, "visited");
+            frontier = os.path.join(tmp, "frontier");
+
+            init = mdl.pack(mdl.initialState);
+            for path in (visited, frontier):
+                with open(path, "wb") as f:
+                    f.write(init);
+
+            n = 1;
+            while n > 0:
+                if(levels is not None):
+                    levels.append(n);
+
+                runs = yield from self._expand(tmp, frontier, dead, live);
+                n = self._merge(tmp, runs, visited, frontier);
+
+    def _expand(self, tmp, frontier, dead, live):
+        """
+        Expand all states in the file [frontier], writing their successors in
+         sorted runs to the directory [tmp]. Adds deadlock states to [dead],
+         and livelock states to [live].
+        Returns each state in [frontier], then the list of runs.
+        """
+        mdl = self.model;
+        size = mdl.stateSize;
+        # memory per buffered successor: its bytes object, its slot in the set
+        #  (16 bytes, at most two thirds and at least a quarter full after
+        #  growing), and its pointer in the sorted list when the run is written
+        entry = sys.getsizeof(bytes(size)) + 64 + 8;
+        limit = max(1, self.budget // entry);
+
+        runs, buf = [], set();
+        def flush():
+            path = os.path.join(tmp, "run%d" % len(runs));
+            with open(path, "wb") as f:
+                # the records are written one by one, not joined into a copy
+                f.writelines(sorted(buf));
+            runs.append(path);
+            buf.clear();
+
+        records = _records(frontier, size);
+        while True:
+            # expand the frontier in chunks (see Model.expand)
+            chunk = [mdl.unpack(data) for data in
+                     itertools.islice(records, self.chunk)];
+            if(not chunk):
+                break;
+
+            for cur, succ in mdl.expand(chunk):
+                yield cur;
+
+                last = None;
+                for i in succ:
+                    last = mdl.pack(i);
+                    buf.add(last);
+
+                    if(len(buf) >= limit):
+                        flush();
+
+                # record dead- and livelocks
+                if(dead is not None and len(succ)==0):
+                    dead.add(cur);
+                if(live is not None and len(succ)==1 and
+                   last==mdl.pack(cur)):
+                    live.add(cur);
+
+        if(buf or not runs):
+            flush();
+
+        return runs;
+
+    def _merge(self, tmp, runs, visited, frontier):
+        """
+        Merge the sorted [runs] with the sorted file [visited], and write all
+         states not yet visited to both [visited] and [frontier].
+        Returns the amount of new states.
+        """
+        size = self.model.stateSize;
+        cand = _unique(heapq.merge(*(_records(r, size) for r in runs)));
+        old = _records(visited, size);
+
+        n = 0;
+        newVisited = os.path.join(tmp, "visited.new");
+        with open(newVisited, "wb") as vo, open(frontier, "wb") as fo:
+            v = next(old, None);
+            for c in cand:
+                while(v is not None and v < c):
+                    vo.write(v);
+                    v = next(old, None);
+
+                if(v==c):
+                    continue;
+
+                vo.write(c);
+                fo.write(c);
+                n += 1;
+
+            while(v is not None):
+                vo.write(v);
+                v = next(old, None);
+
+        os.replace(newVisited, visited);
+        for r in runs:
+            os.remove(r);
+
+        return n;
@@ -50,22 +50,22 @@ class Parser(util.Parser):
 
     @util.Parser.Handler("#expr-binary'", "OP_BINARY")
     def _expr_op_binary(self, stack, match):
-        return Expression(match[0], None, stack.pop());
+        # the left operand is only known on join; a partial Expression would
+        #  be shared (and completed) by every expression with this right side
+        return (match[0], stack.pop());
 
     @util.Parser.Handler("#expr-binary'")
     def _expr_null(self, stack, match):
-        # add dummy Expression for later join
-        return Expression(None, None);
+        # add dummy operator for later join
+        return (None, None);
 
     @util.Parser.Handler("#expr-binary", "#expr-unary")
     def _expr_join(self, stack, match):
-        expr = stack.pop();
-        if(expr.op is None):
+        op, right = stack.pop();
+        if(op is None):
             return;
 
-        assert(expr.args[0] is None);
-        expr.args[0] = stack.pop();
-        return expr;
+        return Expression(op, stack.pop(), right);
 
 class Expression(object):
     """
@@ -104,6 +104,10 @@ class Expression(object):
             self._negate = self.args[0];
             self.args[0]._negate = self;
 
+    def __reduce__(self):
+        # keep only one of each Expression when unpickling
+        return (Expression, (self.op, *self.args));
+
     def __repr__(self):
         if(self.op=="value"):
             return repr(self.args[0]);
@@ -1,5 +1,7 @@
 import itertools;
 
+from . import relations;
+from . import util;
 from .util import cached_property;
 
 class State(object):
@@ -15,6 +17,12 @@ class State(object):
     def __eq__(self, other):
         return all(x==y for x, y in zip(self, other));
 
+    def fingerprint(self):
+        """
+        Returns a 64-bit fingerprint of this state.
+        """
+        return util.mix64(hash(self) & 0xffffffffffffffff);
+
     def clone(self):
         """
         Returns a copy of this state that may be modified.
@@ -28,6 +36,17 @@ class State(object):
         """
         raise NotImplementedError;
 
+    @property
+    def labelMask(self):
+        """
+        Returns the state labels applicable in this state as a bitmask of
+         their bits.
+        """
+        mask = 0;
+        for lbl in self.labels:
+            mask |= lbl.bit;
+        return mask;
+
 class StateLabel(object):
     """
     Abstract state label object.
@@ -51,11 +70,20 @@ class StateLabel(object):
         """
         Returns the necessary enabling set for this label.
         """
-        if(self.tests is None):
+        mask = self.nesMask;
+        if(mask is None):
             return None;
 
-        return set(act for act in self.model.actions
-                   if not self.tests.isdisjoint(act.writes));
+        acts = self.model.relations.actions;
+        return {acts[i] for i in util.bits(mask)};
+
+    @cached_property
+    def nesMask(self):
+        """
+        Returns the necessary enabling set for this label as a bitmask of
+         action bits, or None if this information is not provided.
+        """
+        return self.model.relations.nes[self.index];
 
 class Action(object):
     """
@@ -86,12 +114,31 @@ class Action(object):
         Returns the coenable set of all labels in this action,
          or None if this information is not provided.
         """
-        gs = itertools.chain.from_iterable(g.coenable for g in self.guards);
-        try:
-            return set(gs);
-        except TypeError:
+        mask = self.coenableMask;
+        if(mask is None):
             return None;
 
+        lbls = self.model.relations.labels;
+        return {lbls[i] for i in util.bits(mask)};
+
+    @cached_property
+    def coenableMask(self):
+        """
+        Returns the coenable set of this action as a bitmask of label bits,
+         or None if this information is not provided.
+        """
+        return self.model.relations.coenable[self.index];
+
+    @cached_property
+    def guardMask(self):
+        """
+        Returns the bitmask of the guards of this action.
+        """
+        mask = 0;
+        for g in self.guards:
+            mask |= g.bit;
+        return mask;
+
     @cached_property
     def vars(self):
         """
@@ -153,23 +200,33 @@ class Action(object):
         """
         Returns the do-not-accord set of this action.
         """
-        return set(act for act in self.model.actions
-                   if not self.accords(act));
+        acts = self.model.relations.actions;
+        return {acts[i] for i in util.bits(self.dnaMask)};
+
+    @cached_property
+    def dnaMask(self):
+        """
+        Returns the do-not-accord set of this action as a bitmask of action
+         bits. The relations of all actions are computed at once (see
+         relations.Relations), matching accords().
+        """
+        return self.model.relations.dna[self.index];
 
     @cached_property
     def enables(self):
         """
         Returns the set of guards enabled by this action.
         """
-        # first call to enables will initialize all actions
-        for act in self.model.actions:
-            act.enables = set();
-
-        for lbl in self.model.labels:
-            for act in lbl.NES:
-                act.enables.add(lbl);
+        lbls = self.model.relations.labels;
+        return {lbls[i] for i in util.bits(self.enablesMask)};
 
-        return self.enables;
+    @cached_property
+    def enablesMask(self):
+        """
+        Returns the set of guards enabled by this action as a bitmask of
+         label bits.
+        """
+        return self.model.relations.enables[self.index];
 
     @property
     def score(self):
@@ -203,10 +260,26 @@ class Model(object):
 
     StateSet = set;
 
+    # exploration profile (see profile.Profile), or None
+    profile = None;
+
+    # whether reach() prunes transitions with sleep sets, and the map of
+    #  visited states to their sleep sets
+    sleep = False;
+    SleepMap = dict;
+
     def __init__(self):
         self.actions = self.Actions(self, Action);
         self.labels = self.Labels(self, StateLabel);
 
+    @cached_property
+    def relations(self):
+        """
+        Returns the static partial-order reduction relations of this model
+         (see relations.Relations), computed when first used.
+        """
+        return relations.Relations(self);
+
     class AttrPool(object):
         """
         Object to allocate named objects on demand.
@@ -233,6 +306,10 @@ class Model(object):
                 return self.data[key];
 
             v = self.type(self.model, key);
+            # position in the pool, and the bit used in bitmasks of items
+            v.index = len(self.data);
+            v.bit = 1 << v.index;
+
             self.data[key] = v;
             return v;
 
@@ -291,25 +368,143 @@ class Model(object):
         """
         raise NotImplementedError;
 
+    def nextStatesFor(self, src, mask):
+        """
+        Returns for each successor state of [src] by one of the actions in the
+         bitmask of action bits [mask] a tuple consisting of the state object
+         and the action used to get there. Successors by no action (None)
+         are not returned. Models that can generate the successors of single
+         actions should override this, so that other actions are not
+         evaluated.
+        """
+        return [(s, t) for s, t in self.nextStates(src)
+                if t is not None and t.bit & mask];
+
+    def labelMasks(self, states):
+        """
+        Returns a list of the label bitmasks (see State.labelMask) of each
+         state in [states].
+        """
+        return [s.labelMask for s in states];
+
+    # size in bytes of a packed state, or None if states cannot be packed
+    stateSize = None;
+
+    def pack(self, src):
+        """
+        Returns the state [src] packed into [stateSize] bytes.
+        """
+        raise NotImplementedError;
+
+    def unpack(self, data):
+        """
+        Returns the state packed into the bytes [data].
+        """
+        raise NotImplementedError;
+
+    def expand(self, states):
+        """
+        Returns for each state in [states] a tuple consisting of the state and
+         the list of its successor states.
+        """
+        for src in states:
+            yield (src, [i for i, _ in self.nextStates(src)]);
+
     def enabled(self, src):
         """
         Returns a tuple consisting of the set of all enabled actions from
          state [src], and a sample action.
-        """
-        en, some = set(), None;
-        labels = src.labels;
-        for act in self.actions:
-            # are all of the action's guards enabled?
-            if(not labels.issuperset(act.guards)):
-                act.score = 1;
+        Sets the score of each enabled action to the amount of actions, and
+         of each disabled action to 1. Scores are kept from the previous
+         call, so only actions whose enabledness changed since then (or that
+         stubborn() has reset) are assigned, and only the NES costs of the
+         labels these enable are updated. The scores are shared by all
+         copies of the model (such as reduction.POR), and so is the record
+         of them (relations.Relations.scored).
+        """
+        mask = self.enabledMask(src);
+        rel = self.relations;
+        acts = rel.actions;
+
+        changed = rel.every;
+        if(rel.scored is not None):
+            last, zeroed = rel.scored;
+            changed = (mask ^ last) | zeroed;
+        rel.scored = (mask, 0);
+
+        n = len(acts);
+        for i in util.bits(changed):
+            acts[i].score = n if (mask >> i) & 1 else 1;
+
+        en = {acts[i] for i in util.bits(mask)};
+        some = acts[(mask & -mask).bit_length() - 1] if mask else None;
+        return (en, some);
+
+    def enabledMask(self, src):
+        """
+        Returns the actions enabled in state [src] as a bitmask of action
+         bits.
+        """
+        rel = self.relations;
+        guarded = rel.guarded;
+        disabled = 0;
+        # actions guarded by a label that does not hold
+        for i in util.bits(rel.everyLabel & ~src.labelMask):
+            disabled |= guarded[i];
+        return rel.every & ~disabled;
+
+    def stubbornMask(self, src):
+        """
+        Returns the (enabled) stubborn set for a state [src] as a bitmask of
+         action bits. This is the algorithm of stubborn(), with actions and
+         labels as bits of the static relations (see relations.Relations):
+         the closure adds the DNA of enabled actions, and the NES of the
+         cheapest guard of disabled actions that does not hold. The cost of
+         a guard is computed when it is inspected, from the actions in its
+         NES that are not yet stubborn: each costs the amount of actions if
+         enabled, and 1 otherwise.
+        """
+        en = self.enabledMask(src);
+        if(not en):
+            return 0;
+
+        rel = self.relations;
+        dna, nes, guards = rel.dna, rel.nes, rel.guards;
+        n = len(rel.actions);
+        off = ~src.labelMask;
+
+        stubborn = 0;
+        # start from the first enabled action
+        queue = en & -en;
+        while queue:
+            low = queue & -queue;
+            queue ^= low;
+            stubborn |= low;
+            i = low.bit_length() - 1;
+
+            if(en & low):
+                # add all non-according actions
+                queue |= dna[i] & ~stubborn;
                 continue;
 
-            act.score = len(self.actions);
-            en.add(act);
-            if(some is None):
-                some = act;
+            # add the necessary enabling set for one non-enabled guard
+            best, cost = None, None;
+            for j in util.bits(guards[i] & off):
+                m = nes[j];
+                if(m is None):
+                    m = rel.every;
+                m &= ~stubborn;
 
-        return (en, some);
+                c = n * bin(m & en).count("1") + bin(m & ~en).count("1");
+                if(best is None or c < cost):
+                    best, cost = m, c;
+                if(cost==0):
+                    break;
+
+            assert(best is not None);
+            queue |= best & ~stubborn;
+
+        return stubborn & en;
 
     def stubborn(self, src):
         """
@@ -320,7 +515,7 @@ class Model(object):
         if(some is None):
             return stubborn;
 
-        labels = src.labels;
+        mask = src.labelMask;
         queue = {some};
         while queue:
             """
@@ -339,7 +534,7 @@ class Model(object):
                 # add the necessary enabling set for one non-enabled guard
                 best = None;
                 for g in cur.guards:
-                    if(g in labels):
+                    if(g.bit & mask):
                         continue;
 
                     if(best is None or g.cost < best.cost):
@@ -354,34 +549,238 @@ class Model(object):
             END-CUT-CODE
             """
 
+        # the scores of these actions must be restored by enabled()
+        rel = self.relations;
+        last, zeroed = rel.scored;
+        for act in stubborn:
+            zeroed |= act.bit;
+        rel.scored = (last, zeroed);
+
         return stubborn.intersection(en);
 
-    def reach(self, dead=None, live=None):
+    def reach(self, dead=None, live=None, stats=None, checkpoint=None):
         """
         Iterate through reachable statespace. Adds deadlock states to [dead],
-         and livelock states to [live].
+         and livelock states to [live]. If the visited set can report on its
+         coverage, its report is added to the dict [stats].
+        If a [checkpoint] is given, the exploration is resumed from it when it
+         exists, and it is written periodically. States visited after the last
+         checkpoint are returned again when resuming.
+        If [sleep] is set on the model, transitions are pruned with sleep sets
+         (see sleepSets), and the amount of transitions explored and of
+         actions pruned is added to [stats].
         Returns each reachable state.
         """
         visited = self.StateSet();
         stack = [self.initialState];
+        count = 0;
+
+        # sleep sets: the stack holds tuples of a state and its sleep set, and
+        #  the sleep set of each visited state is kept if not empty
+        sleep = self.sleep;
+        sleeping = self.SleepMap();
+        explored, pruned = 0, 0;
+        z = 0;
+        if(sleep):
+            stack = [(self.initialState, 0)];
+            every = self.relations.every;
+
+        if(checkpoint is not None and checkpoint.exists()):
+            data = checkpoint.load(self);
+            visited, stack = data["visited"], data["stack"];
+            count = data["count"];
+            sleeping = data.get("sleeping", sleeping);
+            explored = data.get("transitions", 0);
+            pruned = data.get("pruned", 0);
+            if(dead is not None):
+                dead.update(data["dead"]);
+            if(live is not None):
+                live.update(data["live"]);
+
+        nextStates, nextStatesFor, seen = (self.nextStates, self.nextStatesFor,
+                                           visited);
+        # whether the model generates the successors of single actions; the
+        #  default nextStatesFor only filters nextStates
+        select = (getattr(nextStatesFor, "__func__", None)
+                  is not Model.nextStatesFor);
+        prof = self.profile;
+        if(prof is not None):
+            prof.start();
+            nextStates = prof.nextStates(nextStates);
+            nextStatesFor = prof.nextStates(nextStatesFor);
+            seen = prof.lookups(visited);
+
+        # with a profile: the depth of each state on the stack (the length of
+        #  the path to it), as the stack holds the successors still to visit
+        depth, depths = 0, None;
+        if(prof is not None):
+            depths = [1] * len(stack);
+
         while stack:
+            if(depths is not None):
+                # successors pushed by the previous state are one level deeper
+                depths.extend([depth + 1] * (len(stack) - len(depths)));
+                depth = depths.pop();
+
             cur = stack.pop();
-            # check if this state was already visited
-            if(cur in visited):
-                continue;
+            if(not sleep):
+                # check if this state was already visited
+                if(cur in seen):
+                    continue;
+
+                # visit all successor states
+                succ = 0;
+                for i, _ in nextStates(cur):
+                    stack.append(i);
+                    succ += 1;
+
+                explored += succ;
+                loop = (succ==1 and stack[-1]==cur);
+            else:
+                cur, z = cur;
+                # a visited state is only explored again for the actions that
+                #  were asleep before, but are not now
+                revisit = cur in seen;
+                if(revisit):
+                    old = sleeping.get(cur, 0);
+                    z &= old;
+                    if(z==old):
+                        continue;
+
+                    mask = old & ~z;
+                    n = -bin(mask).count("1");
+                else:
+                    mask = every & ~z;
+                    n = bin(z).count("1");
+
+                if(z):
+                    sleeping[cur] = z;
+                elif(revisit):
+                    sleeping.pop(cur, None);
+
+                # only the successors by actions awake are generated; those by
+                #  no action (None) are never asleep
+                if(not z and not revisit):
+                    l = list(nextStates(cur));
+                elif(select):
+                    l = list(nextStatesFor(cur, mask));
+                else:
+                    l = [(s, a) for s, a in nextStates(cur)
+                         if a is None or a.bit & mask];
+                pruned += n;
+                explored += len(l);
+                if(prof is not None):
+                    prof.prune(n);
+
+                l.reverse();
+                todo = self.sleepSets(l, z);
+                stack.extend((s, m) for s, _, m in reversed(todo));
+                if(revisit):
+                    continue;
+
+                # the actions asleep are enabled, so the state is a livelock
+                #  only if it has one action (awake or asleep) that loops
+                succ = len(l);
+                loop = (succ==1 and not z and l[0][0]==cur);
+                if(live is not None and succ==0 and n==1):
+                    l = list(self.nextStatesFor(cur, z));
+                    loop = (len(l)==1 and l[0][0]==cur);
 
-            # visit all successor states
-            succ = 0;
-            for i, _ in self.nextStates(cur):
-                stack.append(i);
-                succ += 1;
+            if(prof is not None):
+                prof.visit(succ, depth);
 
-            # record dead- and livelocks
-            if(dead is not None and succ==0):
+            # record dead- and livelocks; a state with actions asleep is no
+            #  deadlock
+            if(dead is not None and succ==0 and not z):
                 dead.add(cur);
-            if(live is not None and succ==1 and stack[-1]==cur):
+            if(live is not None and loop):
                 live.add(cur);
 
             if(cur is not None):
-                visited.add(cur);
+                seen.add(cur);
+                count += 1;
+
                 yield cur;
+
+                # only once the state has been handled by the caller, so that
+                #  a resumed exploration returns it again otherwise
+                if(checkpoint is not None and checkpoint.due(count)):
+                    checkpoint.save(self, count, {
+                        "count": count, "visited": visited, "stack": stack,
+                        "sleeping": sleeping, "transitions": explored,
+                        "pruned": pruned,
+                        "dead": dead or set(), "live": live or set()});
+
+        if(stats is not None and hasattr(visited, "report")):
+            stats.update(visited.report());
+        if(stats is not None):
+            stats.update({"transitions": explored, "pruned": pruned});
+        if(prof is not None):
+            prof.finish();
+
+    def sleepSets(self, succ, sleep):
+        """
+        Returns the successors in [succ] (a list of tuples of a state and an
+         action, in the order they are explored) of a state with the sleep
+         set [sleep] (a bitmask of action bits), as a list of tuples of a
+         state, an action and the sleep set of the state.
+        The sleep set of a successor holds the actions in [sleep], and those
+         explored before it, that are independent of its action (see
+         relations.Relations.independent): each such transition commutes
+         with the one to the successor, so its target is reached already.
+         Actions with several successors are not put to sleep.
+        """
+        indep = self.relations.independent;
+        single = {};
+        for _, a in succ:
+            single[a] = a not in single;
+
+        res = [];
+        done = sleep;
+        for s, a in succ:
+            if(a is None):
+                res.append((s, a, 0));
+                continue;
+
+            res.append((s, a, done & indep[a.index]));
+            if(single[a]):
+                done |= a.bit;
+
+        return res;
+
+    def reachBFS(self, dead=None, live=None, levels=None):
+        """
+        Iterate through reachable statespace, one breadth-first level at a
+         time. Adds deadlock states to [dead], livelock states to [live], and
+         the size of each level to [levels].
+        Returns each reachable state.
+        """
+        visited = self.StateSet();
+        frontier = [self.initialState];
+        if(self.initialState is not None):
+            visited.add(self.initialState);
+
+        while frontier:
+            if(levels is not None):
+                levels.append(len(frontier));
+
+            for cur in frontier:
+                if(cur is not None):
+                    yield cur;
+
+            # collect the unique successors of the whole level
+            succs = {};
+            for cur, succ in self.expand(frontier):
+                # record dead- and livelocks
+                if(dead is not None and len(succ)==0):
+                    dead.add(cur);
+                if(live is not None and len(succ)==1 and succ[0]==cur):
+                    live.add(cur);
+
+                for i in succ:
+                    succs[i] = None;
+
+            # deduplicate against visited states in bulk
+            frontier = [i for i in succs if i not in visited];
+            for i in frontier:
+                visited.add(i);
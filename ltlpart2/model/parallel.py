@@ -0,0 +1,208 @@
+import hashlib;
+import multiprocessing;
+import os;
+import queue;
+import traceback;
+
+from . import util;
+
+# Stern, U.; Dill, D. L. "Parallelizing the Murphi Verifier". Lecture Notes in
+# Computer Science, vol. 1254 (1997): 256--267.
+
+def partition(state, n):
+    """
+    Returns the index of the worker (out of [n]) that owns a given [state].
+    """
+    # the key must be the same in every worker for equal states, so it is
+    #  computed from the slot values themselves (unlike hash(), which is
+    #  salted per process for strings)
+    if(hasattr(state, "__bytes__")):
+        h = hashlib.blake2b(bytes(state), digest_size=8).digest();
+        return int.from_bytes(h, "little") % n;
+
+    h = 0;
+    for v in state:
+        if(not isinstance(v, int)):
+            v = hashlib.blake2b(repr(v).encode(), digest_size=8).digest();
+            v = int.from_bytes(v, "little");
+        h = util.mix64((h ^ v) & 0xffffffffffffffff);
+    return h % n;
+
+class Reach(object):
+    """
+    Parallel reachability object.
+
+    The statespace of a [model] is explored by a number of worker processes,
+     each of which owns the states in its hash partition. Workers expand their
+     own states, and send newly discovered states owned by other workers to
+     them in batches.
+
+    The model is pickled to each worker (a PINS model loads its library again
+     in each worker). States exchanged between workers are pickled with a
+     reference to the model of the receiving process (see util.dumps).
+    """
+    def __init__(self, model, workers=None, batch=256, collect=True):
+        """
+        Create a parallel exploration of a [model] with a given amount of
+         [workers] (by default, one per CPU), exchanging states in batches of
+         [batch] states. If [collect] is set, all reachable states are sent
+         back to be iterated over.
+        """
+        self.model = model;
+        self.workers = workers or os.cpu_count() or 1;
+        self.batch = batch;
+        self.collect = collect;
+
+        self.count = None;
+        self.states = None;
+
+    def __len__(self):
+        return self.count;
+
+    def __iter__(self):
+        """
+        Returns each reachable state (after the exploration has been run).
+        """
+        if(self.states is None):
+            raise RuntimeError("no states collected");
+        return iter(self.states);
+
+    def run(self, dead=None, live=None):
+        """
+        Explore the reachable statespace. Adds deadlock states to [dead],
+         and livelock states to [live].
+        Returns the amount of reachable states.
+        """
+        mdl = self.model;
+        n = self.workers;
+
+        ctx = multiprocessing.get_context();
+        queues = [ctx.Queue() for _ in range(n)];
+        results = ctx.Queue();
+
+        # amount of batches sent but not yet fully processed
+        pending = ctx.Value("q", 0);
+        done = ctx.Event();
+
+        track = (dead is not None, live is not None);
+        procs = [];
+        for i in range(n):
+            args = (mdl, i, queues, results, pending, done, self.batch,
+                    self.collect, track);
+            p = ctx.Process(target=_worker, args=args, daemon=True);
+            p.start();
+            procs.append(p);
+
+        init = mdl.initialState;
+        with pending.get_lock():
+            pending.value += 1;
+        queues[partition(init, n)].put(util.dumps([init], [mdl]));
+
+        # merge results of all workers
+        count, states, error = 0, [], None;
+        for _ in range(n):
+            res = results.get();
+            if(res[0]=="error"):
+                error = res[1];
+                continue;
+
+            c, d, l, s = util.loads(res[1], [mdl]);
+            count += c;
+            if(dead is not None):
+                dead.update(d);
+            if(live is not None):
+                live.update(l);
+            if(s is not None):
+                states.extend(s);
+
+        for p in procs:
+            p.join();
+
+        if(error is not None):
+            raise RuntimeError("worker failed:\n" + error);
+
+        self.count = count;
+        self.states = states if self.collect else None;
+        return count;
+
+def _worker(mdl, index, queues, results, pending, done, batch, collect,
+            track):
+    """
+    Worker process [index] of a parallel exploration of a model [mdl].
+    """
+    try:
+        res = _explore(mdl, index, queues, pending, done, batch, collect,
+                       track);
+    except BaseException:
+        done.set();
+        results.put(("error", traceback.format_exc()));
+    else:
+        results.put(res);
+
+def _explore(mdl, index, queues, pending, done, batch, collect, track):
+    """
+    Explore the partition [index] of the statespace of a model [mdl].
+    Returns a result tuple for the coordinating process.
+    """
+    n = len(queues);
+    inbox = queues[index];
+    out = [[] for _ in range(n)];
+
+    visited = mdl.StateSet();
+    dead = [] if track[0] else None;
+    live = [] if track[1] else None;
+
+    def flush(i):
+        with pending.get_lock():
+            pending.value += 1;
+        queues[i].put(util.dumps(out[i], [mdl]));
+        out[i] = [];
+
+    while(not done.is_set()):
+        try:
+            stack = inbox.get(timeout=0.05);
+        except queue.Empty:
+            continue;
+
+        stack = util.loads(stack, [mdl]);
+
+        while stack:
+            cur = stack.pop();
+            if(cur in visited):
+                continue;
+
+            # visit all successor states
+            succ, last = 0, None;
+            for i, _ in mdl.nextStates(cur):
+                succ += 1;
+                last = i;
+
+                owner = partition(i, n);
+                if(owner==index):
+                    stack.append(i);
+                    continue;
+
+                out[owner].append(i);
+                if(len(out[owner]) >= batch):
+                    flush(owner);
+
+            # record dead- and livelocks
+            if(dead is not None and succ==0):
+                dead.append(cur);
+            if(live is not None and succ==1 and last==cur):
+                live.append(cur);
+
+            visited.add(cur);
+
+        for i in range(n):
+            if(out[i]):
+                flush(i);
+
+        # the last batch processed means the exploration is finished
+        with pending.get_lock():
+            pending.value -= 1;
+            if(pending.value==0):
+                done.set();
+
+    states = list(visited) if collect else None;
+    return ("done", util.dumps((len(visited), dead, live, states), [mdl]));
@@ -0,0 +1,173 @@
+import collections;
+import operator;
+
+from .. import util;
+
+# Blom, S.; Van de Pol, J.; Weber, M. "LTSmin: Distributed and Symbolic
+# Reachability". Lecture Notes in Computer Science, vol. 6174 (2010): 354--359.
+
+def _projection(slots):
+    """
+    Returns a function that projects a state onto the indices [slots], as a
+     tuple.
+    """
+    if(len(slots)==0):
+        return lambda src: ();
+    if(len(slots)==1):
+        i = slots[0];
+        return lambda src: (src[i],);
+    return operator.itemgetter(*slots);
+
+class TransitionCache(object):
+    """
+    Short-vector transition cache for a PINS model.
+
+    For each action group, the successors of a state only depend on the slots
+     the group reads, and on the slots it may (but need not) write. The cache
+     maps the projection of a state onto these slots to the projections of
+     its successors onto the slots the group writes. Groups that hit the
+     cache are expanded without calling into the model library; the model is
+     called once for the groups that miss, and the cache is filled for them.
+
+    The cache holds at most [capacity] short vectors, counting the key of each
+     entry (one per group and short vector) and the successor projections
+     stored for it, so that its size follows the successors it holds rather
+     than the amount of entries. The least recently used entries are evicted
+     when full.
+    """
+    def __init__(self, model, capacity=1 << 16):
+        """
+        Create a transition cache for a PINS model [model] (a
+         pins.pins.Model) with a given [capacity] in short vectors, which
+         must hold at least one entry for each group.
+        """
+        self.model = model;
+        self.capacity = capacity;
+        self.entries = collections.OrderedDict();
+        # amount of short vectors held in the entries
+        self.size = 0;
+
+        self.hits = 0;
+        self.misses = 0;
+        self.evictions = 0;
+
+        # for each group: projections of a state onto its key and write slots,
+        #  and the indices of its write slots
+        self.groups = [];
+
+        n = len(model.stateSlots);
+        read = self._rows("actionRead") or self._rows("actionAccess");
+        may = self._rows("actionMayWrite") or self._rows("actionAccess");
+        must = self._rows("actionMustWrite");
+        if(read is None or may is None):
+            raise ValueError("model has no read/write dependency matrices");
+
+        for g in range(model.actionCount):
+            writes = sorted(may[g]);
+            mustWrite = must[g] if must is not None else set();
+            key = sorted(read[g] | (may[g] - mustWrite));
+            assert(all(i < n for i in key));
+
+            self.groups.append((_projection(key), _projection(writes),
+                                writes));
+
+        # expanding a state fills an entry for each group that misses; below
+        #  one entry per group, the entries of a state evict each other
+        if(capacity < len(self.groups)):
+            raise ValueError("capacity %d below the amount of groups (%d)"
+                             % (capacity, len(self.groups)));
+
+    def _rows(self, kind):
+        """
+        Returns a list of the set of columns of each row in the dependency
+         matrix [kind], or None if the model does not provide it.
+        """
+        mtx = self.model.matrices.get(kind, None);
+        if(mtx is None):
+            return None;
+
+        return [set(util.bits(row)) for row in mtx.rows()];
+
+    def __len__(self):
+        return len(self.entries);
+
+    def nextStates(self, src, select=None):
+        """
+        Returns a list of tuples consisting of each successor state of [src]
+         (of the groups [select], if given) and the action used to get there
+         (see pins.Model.nextStatesBatch).
+        """
+        entries = self.entries;
+        slots = src[:];
+        if(select is None):
+            select = range(len(self.groups));
+
+        # look up the successors of each group
+        found, missing = [], [];
+        for g in select:
+            key, _, writes = self.groups[g];
+            k = (g, key(slots));
+            v = entries.get(k, None);
+            if(v is None):
+                self.misses += 1;
+                missing.append(g);
+                continue;
+
+            self.hits += 1;
+            entries.move_to_end(k);
+            if(v):
+                found.append((g, writes, v));
+
+        type = self.model.stateType;
+        res = [];
+        for g, writes, v in found:
+            for w in v:
+                dst = list(slots);
+                for i, x in zip(writes, w):
+                    dst[i] = x;
+                res.append((type(*dst), g));
+
+        if(missing):
+            res.extend(self._fill(src, slots, missing));
+        return res;
+
+    def _fill(self, src, slots, select):
+        """
+        Generate the successors of [src] (with slots [slots]) of the groups
+         [select] in the model, and add them to the cache for each group.
+        """
+        # all groups at once, unless per-group calls can skip the others
+        res = self.model.nextStatesBatch(src,
+                None if len(select)==len(self.groups) else select);
+
+        values = {g: [] for g in select};
+        for dst, g in res:
+            values[g].append(self.groups[g][1](dst));
+
+        entries = self.entries;
+        for g in select:
+            v = tuple(values[g]);
+            entries[(g, self.groups[g][0](slots))] = v;
+            self.size += 1 + len(v);
+
+        while(self.size > self.capacity):
+            _, v = entries.popitem(last=False);
+            self.size -= 1 + len(v);
+            self.evictions += 1;
+
+        return res;
+
+    def report(self):
+        """
+        Returns a dict with the statistics of this cache.
+        """
+        n = self.hits + self.misses;
+        return {
+            "entries": len(self.entries),
+            "size": self.size,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / n if n else 0.0,
+            "evictions": self.evictions,
+        };
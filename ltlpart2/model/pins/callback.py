@@ -16,6 +16,9 @@ class CallbackGenerator(object):
         self.callback(self.run);
         return iter(self.buf);
 
+# the fallback is kept, to compare against
+fallback = CallbackGenerator;
+
 def init():
     global CallbackGenerator;
 
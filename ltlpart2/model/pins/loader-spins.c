@@ -8,6 +8,8 @@ int spins_get_state_size();
 int spins_get_transition_groups();
 void spins_get_initial_state(int *dst);
 int spins_get_successor_all(void *model, int *src, void *callback, void *usr);
+int spins_get_successor(void *model, int t, int *src, void *callback,
+                        void *usr);
 
 // type info
 char *spins_get_state_variable_name(int var);
@@ -126,6 +128,7 @@ void pins_model_init(void){
 
   // set successor functions
   GBsetNextStateAll(NULL, (void (*)())&spins_get_successor_all);
+  GBsetNextStateLong(NULL, (void (*)())&spins_get_successor);
 
   // set state label names and types
   int labels = spins_get_label_count();
@@ -0,0 +1,73 @@
+import glob;
+import hashlib;
+import os;
+import pickle;
+import zlib;
+
+# format of the stored metadata; bumped whenever it changes
+VERSION = 2;
+
+class MetadataCache(object):
+    """
+    On-disk cache of the metadata of PINS models.
+
+    The metadata of a model (state slot and label names, types, edge labels,
+     actions, guards and dependency matrices) is stored in the directory [dir] as a compressed
+     pickle, keyed by a hash of the model library and of the wrapper and
+     loader libraries it is read through. A model whose libraries have not
+     changed can then skip converting the metadata during loading.
+    """
+    def __init__(self, dir):
+        self.dir = dir;
+
+    def key(self, lib):
+        """
+        Returns the cache key for the model library at path [lib].
+        """
+        path = os.path.dirname(os.path.abspath(__file__));
+        libs = [lib, os.path.join(path, "wrapper.so")];
+        libs.extend(sorted(glob.glob(os.path.join(path, "loader-*.so"))));
+
+        h = hashlib.sha256(b"%d:" % VERSION);
+        for l in libs:
+            with open(l, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk);
+            h.update(b"\0");
+        return h.hexdigest();
+
+    def path(self, key):
+        """
+        Returns the path of the cache file for a [key].
+        """
+        return os.path.join(self.dir, key + ".meta");
+
+    def load(self, key):
+        """
+        Returns the metadata dict stored for a [key], or None if there is no
+         (readable) entry.
+        """
+        try:
+            with open(self.path(key), "rb") as f:
+                data = pickle.loads(zlib.decompress(f.read()));
+        except (OSError, EOFError, zlib.error, pickle.UnpicklingError):
+            return None;
+
+        if(data.get("version", None)!=VERSION):
+            return None;
+        return data;
+
+    def save(self, key, data):
+        """
+        Store the metadata dict [data] for a [key].
+        """
+        os.makedirs(self.dir, exist_ok=True);
+        data = dict(data, version=VERSION);
+        buf = zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL));
+
+        # replace an existing entry atomically
+        path = self.path(key);
+        tmp = "%s.%d.tmp" % (path, os.getpid());
+        with open(tmp, "wb") as f:
+            f.write(buf);
+        os.replace(tmp, path);
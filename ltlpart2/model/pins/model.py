@@ -1,24 +1,106 @@
+import concurrent.futures;
+import ctypes as C;
+import hashlib;
+
 from .. import model;
 from .. import slotState;
+from .. import util;
 from ..util import cached_property;
 
+from . import cache as transitionCache;
 from . import pins;
-from . import callback;
+from . import store;
 
 class State(slotState.SlotState):
     """
     State object for PINS-based model.
+
+    The slots of a state are kept as an offset into an immutable block of
+     bytes, usually (a memoryview of) the block shared by all successors of
+     one call into the model (see pins.Model.nextStatesArena); their length is
+     the state size of the model. States are hashed and compared on slices of
+     the block, without copying; the slots are only materialized into a
+     ctypes array when needed, e.g. to generate the successors of the state.
+    A state is compacted into bytes of its own when it is stored in a
+     visited set (see store.StateSet), so that the block can be freed.
     """
-    def __init__(self, model, data=None):
-        mdl = model.model;
-        assert(isinstance(data, mdl.stateType));
-        super().__init__(model, mdl.stateSlots, data);
+    def __init__(self, model, data=None, offset=0):
+        if(not isinstance(data, (bytes, memoryview))):
+            # ctypes array or buffer
+            data = bytes(data);
+        self.model = model;
+        self.block = data;
+        self.offset = offset;
+
+    @property
+    def names(self):
+        return self.model.model.stateSlots;
+
+    @property
+    def slots(self):
+        """
+        Returns the slots of this state as a (new) ctypes array.
+        """
+        return self.model.model.stateType.from_buffer_copy(self.block,
+                                                           self.offset);
+
+    @property
+    def view(self):
+        """
+        Returns the slot bytes of this state as a memoryview.
+        """
+        o = self.offset;
+        return memoryview(self.block)[o:o + self.model.stateSize];
+
+    def compact(self):
+        """
+        Keep the slots of this state in bytes of its own, rather than in the
+         block it was generated in.
+        """
+        block = self.block;
+        if(not isinstance(block, bytes) or len(block)!=self.model.stateSize):
+            self.block, self.offset = bytes(self), 0;
+
+    def __setitem__(self, n, v):
+        slots = self.slots;
+        slots[self.names.index(n)] = v;
+        self.block, self.offset = bytes(slots), 0;
+
+    def __len__(self):
+        return len(self.names);
+
+    def __iter__(self):
+        return iter(self.view.cast(self.model.model.stateType._type_._type_));
+
+    # slices of a memoryview block share its memory; a slice of a whole bytes
+    #  block is the block itself, so a state of its own keeps the hash cached
+    #  by its bytes
+    def __bytes__(self):
+        o = self.offset;
+        return bytes(self.block[o:o + self.model.stateSize]);
 
     def __hash__(self):
-        return hash(tuple(self.slots[:]));
+        o = self.offset;
+        return hash(self.block[o:o + self.model.stateSize]);
 
     def __eq__(self, other):
-        return self.slots[:]==other.slots[:];
+        o, p, n = self.offset, other.offset, self.model.stateSize;
+        return self.block[o:o + n]==other.block[p:p + n];
+
+    def fingerprint(self):
+        """
+        Returns a 64-bit fingerprint of this state.
+        """
+        # hash the raw slot bytes directly
+        h = hashlib.blake2b(self.view, digest_size=8).digest();
+        return int.from_bytes(h, "little");
+
+    def __getstate__(self):
+        # only the slots of this state, not its whole block
+        return {"model": self.model, "data": bytes(self)};
+
+    def __setstate__(self, state):
+        type(self).__init__(self, state["model"], state["data"]);
 
     @cached_property
     def labels(self):
@@ -28,22 +110,189 @@ class State(slotState.SlotState):
         labels = self.model.model.getStateLabels(self.slots);
         return {self.model._labels[i] for i in labels};
 
+    @cached_property
+    def labelMask(self):
+        """
+        Returns the state labels applicable in this state as a bitmask of
+         their bits.
+        """
+        return self.model.labelMasks([self])[0];
+
+class PackedState(State):
+    """
+    State object for PINS-based model, kept by id in a packed state store.
+    """
+    def __init__(self, model, data=None, offset=0, id=None):
+        self.model = model;
+        if(id is None):
+            if(isinstance(data, (bytes, memoryview)) and
+               len(data)!=model.stateSize):
+                # a state in a block of successors
+                data = data[offset:offset + model.stateSize];
+            id, _ = model.store.put(data);
+        self.id = id;
+
+    @property
+    def slots(self):
+        """
+        Returns the slots of this state as a ctypes array.
+        """
+        return self.model.store.get(self.id);
+
+    def __setitem__(self, n, v):
+        slots = self.slots;
+        slots[self.names.index(n)] = v;
+        self.id, _ = self.model.store.put(slots);
+
+    @property
+    def view(self):
+        """
+        Returns the slot bytes of this state as a memoryview.
+        """
+        # a copy, as an exported buffer would keep the store from growing
+        return memoryview(bytes(self));
+
+    def compact(self):
+        # the store holds the slots already
+        pass;
+
+    def __bytes__(self):
+        size = self.model.store.size;
+        return bytes(self.model.store.data[self.id * size:
+                                           (self.id + 1) * size]);
+
+    def __hash__(self):
+        return self.id;
+
+    def __eq__(self, other):
+        return self.id==other.id;
+
+class _MatrixSet(object):
+    """
+    Descriptor for a set derived from rows of dependency matrices.
+
+    The set holds the items (from the model attribute [items]) of the columns
+     set in the rows of the action or label in any of the given matrices
+     [types]; a matrix type ending in "'" denotes the transposed matrix. The
+     set is computed when first used. Matrices the model does not provide
+     contribute nothing.
+    """
+    def __init__(self, items, *types):
+        self.items = items;
+        self.types = types;
+
+    def __set_name__(self, owner, name):
+        self.name = name;
+
+    def __get__(self, obj, objType=None):
+        if(obj is None):
+            return self;
+
+        mdl = obj.model;
+        mask = 0;
+        for type in self.types:
+            rows = mdl._matrices.get(type, None);
+            if(rows is None):
+                continue;
+            for i in obj._rows:
+                mask |= rows[i];
+
+        items = getattr(mdl, self.items);
+        v = {items[j] for j in util.bits(mask)};
+        obj.__dict__[self.name] = v;
+        return v;
+
+class Action(model.Action):
+    """
+    Action object for PINS-based model.
+    """
+    DNA = _MatrixSet("_actions", "noAccord", "noAccord'");
+    commute = _MatrixSet("_actions", "commute", "commute'");
+    reads = _MatrixSet("_slots", "actionRead");
+    writes = _MatrixSet("_slots", "actionMayWrite", "actionMustWrite");
+
+    def __init__(self, model, id):
+        super().__init__(model, id);
+        # groups of this action
+        self._rows = [];
+
+        # derived from the matrices
+        del self.commute, self.reads, self.writes;
+
+class StateLabel(model.StateLabel):
+    """
+    State label object for PINS-based model.
+    """
+    NES = _MatrixSet("_actions", "guardNES");
+    NDS = _MatrixSet("_actions", "guardNDS");
+    coenable = _MatrixSet("_labels", "coenable");
+    tests = _MatrixSet("_slots", "guardTest");
+
+    def __init__(self, model, id):
+        super().__init__(model, id);
+        self._rows = [];
+
+        # derived from the matrices
+        del self.NDS, self.coenable, self.tests;
+
 class Model(model.Model):
     """
     PINS-based model object.
     """
-    def __init__(self, lib):
+    # visited states keep only their own slots (see State.compact)
+    StateSet = store.StateSet;
+
+    def __init__(self, lib, packed=False, cache=None, metaCache=None,
+                 threads=None):
         """
-        Create a PINS model from a library [lib].
+        Create a PINS model from a library [lib]. If [packed] is set, states
+         are kept in a packed state store and identified by their id. If a
+         [cache] capacity is given, transitions are cached on the slots each
+         action group depends on (see cache.TransitionCache). If a directory
+         [metaCache] is given, the model metadata is cached in it. If an
+         amount of [threads] is given, expand() generates successors on a
+         pool of threads.
         """
         super().__init__();
-        mdl = pins.Model(lib);
+        mdl = pins.Model(lib, metaCache);
+
+        self.lib = lib;
+        self.packed = packed;
+        self.metaCache = metaCache;
+
+        self.threads = threads;
+        self._pool = None;
+
+        # successors as pairs of slots and group; None for the successors as
+        #  offsets into one block (see pins.Model.nextStatesArena)
+        self.cache = None;
+        self._nextStates = None;
+        if(cache is not None):
+            self.cache = transitionCache.TransitionCache(mdl, cache);
+            self._nextStates = self.cache.nextStates;
 
         self.name = mdl.wrapper.name;
         self.model = mdl;
 
-        self.initialState = State(self, mdl.initialState);
+        self.stateSize = C.sizeof(mdl.stateType);
+
+        self.State = State;
+        if(packed):
+            self.store = store.StateStore(mdl.stateType);
+            self.State = PackedState;
+            self.StateSet = lambda: store.StateIdSet(self);
+            self.SleepMap = lambda: store.StateIdMap(self);
+            # the store copies each state, so successors need not be copied
+            #  out of the wrapper buffers first
+            if(cache is None):
+                self._nextStates = mdl.successors;
+
+        self.initialState = self.State(self, mdl.initialState);
         # create actions and state labels
+        self.actions = self.Actions(self, Action);
+        self.labels = self.Labels(self, StateLabel);
+        self._slots = mdl.stateSlots;
+
         self._actions = [None] * mdl.actionCount;
         acts = self._actions;
         for i in range(mdl.actionCount):
@@ -52,62 +301,163 @@ class Model(model.Model):
                 action = mdl.actionLabel[i];
 
             acts[i] = self.actions.get(action);
+            # several groups may share an action label
+            acts[i]._rows.append(i);
+
+        # groups of each action, by action index
+        self._groups = [act._rows for act in self.actions];
 
         self._labels = [None] * len(mdl.stateLabels);
         lbls = self._labels;
         for i, v in enumerate(mdl.stateLabels):
             lbls[i] = self.labels.get(v);
+            # several PINS labels may share a name
+            lbls[i]._rows.append(i);
+
+        # label masks from the wrapper use the PINS label index as bit; if
+        #  names repeat, these are mapped to the bits of the shared labels
+        self._labelBits = None;
+        if(any(l.index!=i for i, l in enumerate(lbls))):
+            self._labelBits = [l.bit for l in lbls];
 
         # set up guards
         for i, j in mdl.actionGuards.items():
             ai = acts[i];
             ai.guards.update(lbls[k] for k in j);
 
-        # convert matrices
-        slots = mdl.stateSlots;
-        matrices = {
-            "noAccord":        (acts, acts,  "DNA",      "DNA"),
-            "guardNES":        (lbls, acts,  "NES",      None),
-            "guardNDS":        (lbls, acts,  "NDS",      None),
-            "commute":         (acts, acts,  "commute",  "commute"),
-            "coenable":        (lbls, lbls,  "coenable", None),
-            "actionRead":      (acts, slots, "reads",    None),
-            "actionMayWrite":  (acts, slots, "writes",   None),
-            "actionMustWrite": (acts, slots, "writes",   None),
-            "guardTest":       (lbls, slots, "tests",    None),
+        # read the matrices as bit rows (and columns, for symmetric
+        #  relations); sets are derived from these when first used
+        sizes = {
+            "noAccord":        (acts, acts),
+            "guardNES":        (lbls, acts),
+            "guardNDS":        (lbls, acts),
+            "commute":         (acts, acts),
+            "coenable":        (lbls, lbls),
+            "actionRead":      (acts, self._slots),
+            "actionMayWrite":  (acts, self._slots),
+            "actionMustWrite": (acts, self._slots),
+            "guardTest":       (lbls, self._slots),
         };
 
-        # create empty sets
-        for type, (rows, cols, rowSet, colSet) in matrices.items():
-            if(rowSet):
-                for r in rows:
-                    setattr(r, rowSet, set());
-            if(colSet and rows!=cols):
-                for c in cols:
-                    setattr(c, colSet, set());
-
-        # fill sets
-        for type, (rows, cols, rowSet, colSet) in matrices.items():
+        self._matrices = {};
+        for type, (rows, cols) in sizes.items():
             mtx = mdl.matrices.get(type, None);
             if(mtx is None):
                 continue;
             assert(mtx.n==len(rows) and mtx.m==len(cols));
 
-            for i, j in mtx:
-                io, jo = rows[i], cols[j];
-                if(rowSet):
-                    getattr(io, rowSet).add(jo);
-                if(colSet):
-                    getattr(jo, colSet).add(io);
+            self._matrices[type] = mtx.rows();
+            if(rows is cols):
+                self._matrices[type + "'"] = mtx.columns();
+
+    def __reduce__(self):
+        # the PINS library is loaded again when unpickled
+        capacity = self.cache.capacity if self.cache is not None else None;
+        return (type(self), (self.lib, self.packed, capacity,
+                             self.metaCache, self.threads));
+
+    def __copy__(self):
+        mdl = object.__new__(type(self));
+        mdl.__dict__.update(self.__dict__);
+        return mdl;
+
+    def pack(self, src):
+        """
+        Returns the state [src] packed into [stateSize] bytes.
+        """
+        return bytes(src);
+
+    def unpack(self, data):
+        """
+        Returns the state packed into the bytes [data].
+        """
+        return self.State(self, bytes(data));
+
+    def labelMasks(self, states):
+        """
+        Returns a list of the label bitmasks (see State.labelMask) of each
+         state in [states].
+        """
+        data = b"".join(bytes(s) for s in states);
+        masks = self.model.getStateLabelMasks(data, len(states));
+        bits = self._labelBits;
+        if(bits is None):
+            return masks;
+
+        res = [];
+        for m in masks:
+            mask = 0;
+            for i in util.bits(m):
+                mask |= bits[i];
+            res.append(mask);
+        return res;
+
+    def expand(self, states):
+        """
+        Returns for each state in [states] a tuple consisting of the state and
+         the list of its successor states.
+        With [threads] set, the successors of chunks of [states] are generated
+         concurrently; the model library must then be thread-safe. Threads
+         only call into the library (which runs without the GIL); state
+         objects are created by the caller.
+        Successors that are not generated by the library alone (through the
+         transition cache, or a reduced nextStates such as reduction.POR)
+         are generated serially through nextStates.
+        """
+        if(not self.threads or self.cache is not None or
+           getattr(self.nextStates, "__func__", None) is not Model.nextStates):
+            yield from super().expand(states);
+            return;
+
+        if(self._pool is None):
+            self._pool = concurrent.futures.ThreadPoolExecutor(self.threads);
+
+        states = list(states);
+        slots = [src.slots for src in states];
+        nextStates = self.model.nextStatesArena;
+        def run(chunk):
+            return [nextStates(src) for src in chunk];
+
+        # a few chunks per thread to balance the load
+        n = max(1, -(-len(states) // (4 * self.threads)));
+        chunks = [states[i:i + n] for i in range(0, len(states), n)];
+        work = [slots[i:i + n] for i in range(0, len(states), n)];
+        for chunk, res in zip(chunks, self._pool.map(run, work)):
+            for src, (block, succ) in zip(chunk, res):
+                block = memoryview(block);
+                yield (src, [self.State(self, block, off) for off, _ in succ]);
 
     def nextStates(self, src):
         """
         Returns for each successor state of [src] a tuple consisting of the
          state object and the action used to get there.
         """
-        mdl = self.model;
-        def call(callback):
-            mdl.nextStates(src.slots, callback);
+        return self._successors(src, None);
+
+    def nextStatesFor(self, src, mask):
+        """
+        Returns for each successor state of [src] by one of the actions in the
+         bitmask of action bits [mask] a tuple consisting of the state object
+         and the action used to get there. Only the groups of these actions
+         are called.
+        """
+        rows = self._groups;
+        groups = [g for i in util.bits(mask) for g in rows[i]];
+        return self._successors(src, groups);
+
+    def _successors(self, src, select):
+        """
+        Returns the successors of [src] of the groups [select] (or all groups,
+         if None) like nextStates.
+        """
+        acts = self._actions;
+        State = self.State;
+        if(self._nextStates is None):
+            block, succ = self.model.nextStatesArena(src.slots, select);
+            block = memoryview(block);
+            return [(State(self, block, off), acts[act]) for off, act in succ];
 
-        for dst, act in callback.CallbackGenerator(call):
-            yield (State(self, dst), self._actions[act]);
+        # states are created before the first is returned, as successors may
+        #  be views of buffers reused by the next call (see pins.successors)
+        return [(State(self, dst), acts[act])
+                for dst, act in self._nextStates(src.slots, select)];
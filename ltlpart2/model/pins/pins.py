@@ -1,13 +1,17 @@
 import os;
+import threading;
 import ctypes as C;
 
+from .. import util;
+from . import metadata;
+
 # keep references to all types or they might be garbage collected
 ctypes = None;
 
 def init():
     # prepare C types
     t = {};
-    t["wrapperCb"] = C.CFUNCTYPE(None, C.c_char_p, C.c_int,
+    t["wrapperCb"] = C.CFUNCTYPE(None, C.c_int, C.c_int,
                                  C.POINTER(C.c_void_p));
 
     t["stateSlot"] = C.c_int;
@@ -44,15 +48,42 @@ def init():
                     ("m", C.c_int),
                     ("data", C.POINTER(C.c_char))];
 
+        # maps zero bytes to "0", and all other bytes to "1"
+        _digits = b"0" + b"1" * 255;
+
+        def _masks(self, vectors):
+            """
+            Returns each byte vector in [vectors] as an integer bitmask of its
+             nonzero entries.
+            """
+            d = self._digits;
+            return [int(v.translate(d)[::-1] or b"0", 2) for v in vectors];
+
+        def rows(self):
+            """
+            Returns each row of the matrix as an integer bitmask of its nonzero
+             columns.
+            """
+            m = self.m;
+            data = C.string_at(self.data, self.n * m);
+            return self._masks(data[i:i + m] for i in range(0, len(data), m));
+
+        def columns(self):
+            """
+            Returns each column of the matrix as an integer bitmask of its
+             nonzero rows.
+            """
+            m = self.m;
+            data = C.string_at(self.data, self.n * m);
+            return self._masks(data[j::m] for j in range(m));
+
         def __iter__(self):
             """
             Returns (row, col) of each nonzero entry in the matrix.
             """
-            for i in range(self.n):
-                for j in range(self.m):
-                    coord = (i, j);
-                    if(coord in self):
-                        yield coord;
+            for i, row in enumerate(self.rows()):
+                for j in util.bits(row):
+                    yield (i, j);
 
         def __contains__(self, coord):
             i, j = coord;
@@ -133,14 +164,58 @@ class EdgeLabel(Label):
     """
     pass;
 
+class BitMatrix(object):
+    """
+    Dependency matrix object, kept as an integer bitmask per row and column.
+    """
+    def __init__(self, n, m, rows, columns):
+        self.n = n;
+        self.m = m;
+        self._rows = rows;
+        self._columns = columns;
+
+    def rows(self):
+        """
+        Returns each row of the matrix as an integer bitmask of its nonzero
+         columns.
+        """
+        return self._rows;
+
+    def columns(self):
+        """
+        Returns each column of the matrix as an integer bitmask of its nonzero
+         rows.
+        """
+        return self._columns;
+
+    def __iter__(self):
+        """
+        Returns (row, col) of each nonzero entry in the matrix.
+        """
+        for i, row in enumerate(self._rows):
+            for j in util.bits(row):
+                yield (i, j);
+
+    def __contains__(self, coord):
+        i, j = coord;
+        return ((self._rows[i] >> j) & 1)!=0;
+
 class Model(object):
     """
     PINS model object.
     """
-    def __init__(self, lib):
+    def __init__(self, lib, metaCache=None):
+        """
+        Load a PINS model from a library [lib]. If a directory [metaCache] is
+         given, the model metadata is cached in it (see
+         metadata.MetadataCache).
+        """
         # callback functions
         self._nextStates = None;
 
+        # successor buffers for nextStatesBatch (states, groups), per thread
+        self._local = threading.local();
+
         # transition system types
         self.types = {};
         self.matrices = {};
@@ -157,13 +232,86 @@ class Model(object):
         self.actionLabel = None;
         self.actionGuards = {};
 
-        # create wrapper
-        self.wrapper = Wrapper(self, lib);
+        # look up cached metadata
+        key, meta = None, None;
+        if(metaCache is not None):
+            metaCache = metadata.MetadataCache(metaCache);
+            key = metaCache.key(lib);
+            meta = metaCache.load(key);
+
+        # create wrapper; with cached metadata only the essential calls are
+        #  made into Python
+        forward = Wrapper.essential if meta is not None else None;
+        self.wrapper = Wrapper(self, lib, forward);
+
+        if(meta is not None):
+            self.restore(meta);
+            return;
 
         if(self.actionLabel is None and len(self.edgeLabels) > 0):
             self.actionLabel = self.edgeLabels[0];
             assert(self.actionCount==len(self.actionLabel));
 
+        if(metaCache is not None):
+            metaCache.save(key, self.metadata());
+
+    def metadata(self):
+        """
+        Returns a dict with the metadata of this model.
+        """
+        # types and labels refer to types by id
+        tids = {id(t): i for i, t in self.types.items()};
+        types = {i: (t.name, t.format, t.chunks)
+                 for i, t in self.types.items()};
+        edgeLabels = [(l.name, tids.get(id(l.type), None))
+                      for l in self.edgeLabels];
+
+        action = None;
+        if(self.actionLabel is not None):
+            action = self.edgeLabels.index(self.actionLabel);
+
+        return {
+            "stateSlots": self.stateSlots,
+            "stateLabels": self.stateLabels,
+            "types": types,
+            "edgeLabels": edgeLabels,
+            "actionCount": self.actionCount,
+            "actionLabel": action,
+            "actionGuards": self.actionGuards,
+            "matrices": {k: (m.n, m.m, m.rows(), m.columns())
+                         for k, m in self.matrices.items()},
+        };
+
+    def restore(self, meta):
+        """
+        Set up this model from a dict [meta] returned by metadata().
+        """
+        assert(len(meta["stateSlots"])==len(self.stateSlots));
+        self.stateSlots = meta["stateSlots"];
+        self.stateLabels = meta["stateLabels"];
+
+        self.types = {};
+        for i, (name, format, chunks) in meta["types"].items():
+            t = self.types[i] = LTSType(name);
+            t.format = format;
+            t.chunks = list(chunks);
+
+        self.edgeLabels = [];
+        for name, tid in meta["edgeLabels"]:
+            l = EdgeLabel(self);
+            l.name = name;
+            l.type = self.types[tid] if tid is not None else None;
+            self.edgeLabels.append(l);
+
+        self.actionCount = meta["actionCount"];
+        self.actionLabel = None;
+        if(meta["actionLabel"] is not None):
+            self.actionLabel = self.edgeLabels[meta["actionLabel"]];
+        self.actionGuards = meta["actionGuards"];
+
+        self.matrices = {k: BitMatrix(*v)
+                         for k, v in meta["matrices"].items()};
+
     @CTypes([C.c_int])
     def setStateLength(self, n):
         self.stateSlots = [None] * n;
@@ -194,6 +342,96 @@ class Model(object):
         cb = ctypes["nextStatesCb"](convert);
         self._nextStates(None, src, cb, None);
 
+    def _growBatch(self, n):
+        """
+        Resize the successor buffers to hold at least [n] states.
+        """
+        dmax = 64;
+        while(dmax < n):
+            dmax *= 2;
+
+        length = len(self.stateSlots);
+        self._local.batch = ((ctypes["stateSlot"] * (dmax * length))(),
+                             (C.c_int * dmax)());
+
+    def _nextStatesBuffer(self, src, select=None):
+        """
+        Collect the successors of [src] into the buffers of this thread; if a
+         collection of groups [select] is given, only those of these groups.
+        Returns the amount of successors, and the slot and group buffers.
+        """
+        assert(isinstance(src, self.stateType));
+        local = self._local;
+        if(not hasattr(local, "batch")):
+            self._growBatch(0);
+
+        lib = self.wrapper.libWrapper;
+        length = len(self.stateSlots);
+        if(select is not None):
+            mask = bytearray(self.actionCount);
+            for g in select:
+                mask[g] = 1;
+            mask = bytes(mask);
+
+        while True:
+            dst, groups = local.batch;
+            dmax = len(groups);
+            if(select is None):
+                n = lib._wrapperNextStates(dst, groups, dmax, length, src);
+            else:
+                n = lib._wrapperNextStatesFor(dst, groups, dmax, length, src,
+                                              mask, len(mask));
+            if(n <= dmax):
+                break;
+
+            # buffers too small; retry with room for all successors
+            self._growBatch(n);
+
+        return n, dst, groups;
+
+    def nextStatesBatch(self, src, select=None):
+        """
+        Returns a list of tuples consisting of each successor state of [src]
+         and the action used to get there, collected by the wrapper in a
+         single call. The GIL is released during the call, and each thread
+         uses its own buffers.
+        If a collection of groups [select] is given, only the successors of
+         these groups are generated: with a per-group next-state function
+         (GBsetNextStateLong), the other groups are not called at all.
+        """
+        n, dst, groups = self._nextStatesBuffer(src, select);
+        size = C.sizeof(self.stateType);
+        fn = self.stateType.from_buffer_copy;
+        return [(fn(dst, i * size), groups[i]) for i in range(n)];
+
+    def nextStatesArena(self, src, select=None):
+        """
+        Returns a tuple consisting of an immutable block of bytes holding the
+         slots of all successors of [src] (of the groups [select], if given)
+         back-to-back, and a list of tuples of the offset of each successor
+         in that block and the action used to get there. The slots are copied
+         out of the successor buffers once, for all successors together.
+        """
+        n, dst, groups = self._nextStatesBuffer(src, select);
+        size = C.sizeof(self.stateType);
+        block = C.string_at(dst, n * size);
+        return block, [(i * size, groups[i]) for i in range(n)];
+
+    def successors(self, src, select=None):
+        """
+        Yields a tuple consisting of each successor state of [src] (of the
+         groups [select], if given) and the action used to get there, without
+         copying the states: each state is a memoryview of its slot bytes in
+         the successor buffers of this thread. These views are only valid
+         until the next call on this thread; a state that is kept must be
+         copied (e.g. with bytes()).
+        """
+        n, dst, groups = self._nextStatesBuffer(src, select);
+        size = C.sizeof(self.stateType);
+        view = memoryview(dst).cast("B");
+        for i in range(n):
+            yield (view[i * size:(i + 1) * size], groups[i]);
+
     # State labels
     @CTypes([C.c_int])
     def setStateLabelCount(self, n):
@@ -214,6 +452,24 @@ class Model(object):
         n = self.wrapper.libWrapper._wrapperGetStateLabels(dst, dmax, src);
         return dst[:n];
 
+    def getStateLabelMasks(self, src, n):
+        """
+        Returns for each of the [n] states stored back-to-back in the buffer
+         [src] a bitmask of the indices of its state labels.
+        """
+        dmax = len(self.stateLabels);
+        stride = (dmax + 7) >> 3;
+        dst = (C.c_ubyte * (n * stride))();
+
+        err = self.wrapper.libWrapper._wrapperGetStateLabelMasks(
+                dst, stride, dmax, len(self.stateSlots), src, n);
+        if(err < 0):
+            raise MemoryError("cannot allocate state label buffer");
+
+        data = bytes(dst);
+        return [int.from_bytes(data[i:i + stride], "little")
+                for i in range(0, n * stride, stride)];
+
     # Edge labels
     @CTypes([C.c_int])
     def setActionCount(self, n):
@@ -234,7 +490,8 @@ class Model(object):
             # use matrix size to set actionCount
             self.actionCount = mtx.n;
 
-        self.matrices[kind] = mtx;
+        self.matrices[kind] = BitMatrix(mtx.n, mtx.m, mtx.rows(),
+                                        mtx.columns());
 
     @CTypes([C.c_int, ctypes["guard"]])
     def setGuards(self, i, guard):
@@ -255,9 +512,13 @@ class Wrapper(object):
     """
     name = "PINS";
 
-    def __init__(self, model, lib):
+    # calls needed even when the model metadata is cached
+    essential = ["setStateLength", "setInitialState", "setNextStatesFn"];
+
+    def __init__(self, model, lib, forward=None):
         """
-        Create a wrapper for a PINS model from a library [lib].
+        Create a wrapper for a PINS model from a library [lib]. If a list of
+         calls [forward] is given, only those calls are passed to the model.
         """
         self.model = model;
 
@@ -265,9 +526,17 @@ class Wrapper(object):
         path = os.path.dirname(os.path.abspath(__file__));
         self.libWrapper = C.CDLL(path + "/wrapper.so", mode=C.RTLD_GLOBAL);
 
+        # resolve each wrapper call once
+        self.handlers = [self._compile(c) for c in self.calls];
+
         dispatch = ctypes["wrapperCb"](self.dispatch);
         self.libWrapper._wrapperInit(dispatch);
 
+        mask = (1 << len(self.calls)) - 1;
+        if(forward is not None):
+            mask = sum(1 << self.calls.index(c) for c in forward);
+        self.libWrapper._wrapperSetForward(C.c_ulonglong(mask));
+
         # set up model library
         libModel = C.CDLL(lib, mode=C.RTLD_GLOBAL);
         loader = libModel;
@@ -297,50 +566,105 @@ class Wrapper(object):
 
         loader.pins_model_init();
 
-    def dispatch(self, type, argc, argv):
+    # wrapper calls, in the order of enum _wrapperCall in wrapper.c
+    calls = [
+        "setActionCount",
+        "setActionLabel",
+        "setStateLength",
+        "setStateSlotName",
+        "setInitialState",
+        "setNextStatesFn",
+        "setStateLabelCount",
+        "setStateLabelName",
+        "setMatrix",
+        "setEdgeLabelCount",
+        "edgeLabels.#.setName",
+        "edgeLabels.#.setType",
+        "setGuards",
+        "setGuardsAll",
+        "addType",
+        "types.#.setFormat",
+        "types.#.addChunk",
+    ];
+
+    @staticmethod
+    def _converter(t):
+        """
+        Returns a function converting a pointer argument to the ctypes type
+         [t] into its Python value.
         """
-        Dispatch a PINS function call given by [type], with [argc] arguments
-         given in [argv], to the appropriate Python method.
+        if(t is C.c_int):
+            return lambda v: C.c_int.from_address(v).value;
+        elif(t is C.c_char_p):
+            return lambda v: str(C.string_at(v), "ascii");
+        elif(t is C.c_void_p):
+            return lambda v: v;
+        else:
+            return lambda v: C.cast(v, t);
+
+    def _compile(self, type):
+        """
+        Returns a handler for the PINS function call given by [type], which
+         takes the argument count and arguments from the wrapper.
         """
         # [type] is a string representing a method
-        type = str(C.string_at(type), "ascii").split(".");
+        path = type.split(".");
+        conv = {};
 
-        argi = 0;
-        try:
-            obj = self.model;
-            for attr in type:
-                if(attr=="#" or attr=="*"):
-                    # use argument as attribute
-                    # asterisk means pointer-sized argument
-                    cast = C.c_void_p if attr=="*" else C.c_uint;
-                    attr = C.cast(argv[argi], C.POINTER(cast))[0];
-                    argi += 1;
-
-                    obj = obj[attr];
-                else:
-                    obj = getattr(obj, attr);
-        except AttributeError:
-            obj = None;
-
-        if(obj is None):
-            raise NotImplementedError(type);
-
-        # cast arguments to appropriate types
-        args = [];
-        for i in range(argi, argc):
-            v = argv[i];
-            t = obj.argtypes[i - argi];
-
-            if(t is C.c_int):
-                n = C.cast(v, C.POINTER(C.c_int))[0];
-            elif(t is C.c_char_p):
-                n = str(C.string_at(v), "ascii");
-            elif(t is C.c_void_p):
-                n = v;
-            else:
-                n = C.cast(v, t);
+        def resolve(argv):
+            """
+            Returns the method for [type] and the index of its first argument
+             in [argv].
+            """
+            argi = 0;
+            try:
+                obj = self.model;
+                for attr in path:
+                    if(attr=="#" or attr=="*"):
+                        # use argument as attribute
+                        # asterisk means pointer-sized argument
+                        cast = C.c_void_p if attr=="*" else C.c_uint;
+                        attr = cast.from_address(argv[argi]).value;
+                        argi += 1;
+
+                        obj = obj[attr];
+                    else:
+                        obj = getattr(obj, attr);
+            except AttributeError:
+                obj = None;
 
-            args.append(n);
+            if(obj is None):
+                raise NotImplementedError(type);
 
-        # call method
-        obj(*args);
+            return obj, argi;
+
+        if("#" not in path and "*" not in path):
+            # plain methods of the model are bound right away
+            obj, _ = resolve(None);
+            args = [self._converter(t) for t in obj.argtypes];
+
+            def handler(argc, argv):
+                obj(*[c(v) for c, v in zip(args, argv[0:argc])]);
+
+            return handler;
+
+        def handler(argc, argv):
+            obj, argi = resolve(argv);
+
+            # argument converters are set up on the first call of each method
+            fn = obj.__func__;
+            if(fn not in conv):
+                conv[fn] = [self._converter(t) for t in obj.argtypes];
+
+            args = zip(conv[fn], argv[argi:argc]);
+            obj(*[c(v) for c, v in args]);
+
+        return handler;
+
+    def dispatch(self, type, argc, argv):
+        """
+        Dispatch a PINS function call given by the index [type] into calls,
+         with [argc] arguments given in [argv], to the appropriate Python
+         method.
+        """
+        self.handlers[type](argc, argv);
@@ -0,0 +1,234 @@
+import array;
+import collections.abc;
+import ctypes as C;
+
+class StateStore(object):
+    """
+    Packed store for fixed-width state vectors.
+
+    States are kept back-to-back in one growable buffer, and are found through
+     an open-addressing hash index. Each state is identified by its position
+     in the buffer (its id).
+    """
+    def __init__(self, type, capacity=1024):
+        """
+        Create a store for states of the ctypes array [type], with an index
+         of an initial [capacity] (a power of two).
+        """
+        self.type = type;
+        self.size = C.sizeof(type);
+
+        self.data = bytearray();
+        self.hashes = array.array("q");
+
+        self.table = array.array("q", [-1]) * capacity;
+        self.mask = capacity - 1;
+
+    def __len__(self):
+        return len(self.hashes);
+
+    def _grow(self):
+        """
+        Double the size of the hash index.
+        """
+        cap = 2 * len(self.table);
+        table = array.array("q", [-1]) * cap;
+        mask = cap - 1;
+
+        for id, h in enumerate(self.hashes):
+            i = h & mask;
+            while(table[i]!=-1):
+                i = (i + 1) & mask;
+            table[i] = id;
+
+        self.table = table;
+        self.mask = mask;
+
+    def _probe(self, key, h):
+        """
+        Returns the index slot for a packed state [key] with hash [h], and the
+         id found in that slot (-1 if the state is not in the store).
+        """
+        table, mask, size = self.table, self.mask, self.size;
+        i = h & mask;
+        while True:
+            id = table[i];
+            if(id==-1):
+                return i, -1;
+
+            if(self.hashes[id]==h):
+                off = id * size;
+                if(self.data[off:off + size]==key):
+                    return i, id;
+
+            i = (i + 1) & mask;
+
+    def find(self, src):
+        """
+        Returns the id of a state [src], or -1 if it is not in the store.
+        """
+        key = bytes(src);
+        return self._probe(key, hash(key))[1];
+
+    def put(self, src):
+        """
+        Find or insert a state [src].
+        Returns a tuple consisting of the id of the state, and whether it was
+         newly added.
+        """
+        key = bytes(src);
+        h = hash(key);
+        i, id = self._probe(key, h);
+        if(id >= 0):
+            return id, False;
+
+        id = len(self.hashes);
+        self.data += key;
+        self.hashes.append(h);
+        self.table[i] = id;
+
+        # keep the index at most half full
+        if(2 * len(self.hashes) > len(self.table)):
+            self._grow();
+
+        return id, True;
+
+    def get(self, id):
+        """
+        Returns the state with a given [id] as a ctypes array.
+        """
+        return self.type.from_buffer_copy(self.data, id * self.size);
+
+class StateSet(set):
+    """
+    Set of PINS states, which keep their slots in bytes of their own once
+     added (see State.compact).
+    """
+    def add(self, item):
+        """
+        Add a given state [item] to this set.
+        """
+        item.compact();
+        set.add(self, item);
+
+class StateIdSet(collections.abc.MutableSet):
+    """
+    Set of packed states, stored as a bitmap over state ids.
+    """
+    def __init__(self, model):
+        self.model = model;
+        self.bits = bytearray();
+        self.count = 0;
+
+    def __len__(self):
+        return self.count;
+
+    def __getstate__(self):
+        # ids are local to a store; pickle the packed states instead
+        mdl = self.model;
+        data = b"".join(mdl.store.data[s.id * mdl.store.size:
+                                       (s.id + 1) * mdl.store.size]
+                        for s in self);
+        return {"model": mdl, "data": data};
+
+    def __setstate__(self, state):
+        mdl = state["model"];
+        self.__init__(mdl);
+
+        data, size = state["data"], mdl.store.size;
+        for off in range(0, len(data), size):
+            self.add(mdl.unpack(data[off:off + size]));
+
+    def __contains__(self, item):
+        id = item.id;
+        i = id >> 3;
+        return i < len(self.bits) and (self.bits[i] & (1 << (id & 7)))!=0;
+
+    def __iter__(self):
+        mdl = self.model;
+        for i, b in enumerate(self.bits):
+            if(b==0):
+                continue;
+
+            for j in range(8):
+                if((b >> j) & 1):
+                    yield mdl.State(mdl, id=(i << 3) | j);
+
+    def add(self, item):
+        """
+        Add a given state [item] to this set.
+        """
+        id = item.id;
+        i = id >> 3;
+        if(i >= len(self.bits)):
+            self.bits.extend(bytes(max(i + 1 - len(self.bits),
+                                       len(self.bits))));
+
+        b = self.bits[i];
+        m = 1 << (id & 7);
+        if(not b & m):
+            self.bits[i] = b | m;
+            self.count += 1;
+
+    def discard(self, item):
+        """
+        Remove a given state [item] from this set.
+        """
+        id = item.id;
+        i = id >> 3;
+        if(i >= len(self.bits)):
+            return;
+
+        b = self.bits[i];
+        m = 1 << (id & 7);
+        if(b & m):
+            self.bits[i] = b & ~m;
+            self.count -= 1;
+
+class StateIdMap(object):
+    """
+    Map of packed states to values, keyed by state id.
+    """
+    def __init__(self, model):
+        self.model = model;
+        self.data = {};
+
+    def __len__(self):
+        return len(self.data);
+
+    def __getstate__(self):
+        # ids are local to a store; pickle the packed states instead
+        mdl = self.model;
+        size = mdl.store.size;
+        items = [(bytes(mdl.store.data[id * size:(id + 1) * size]), v)
+                 for id, v in self.data.items()];
+        return {"model": mdl, "items": items};
+
+    def __setstate__(self, state):
+        mdl = state["model"];
+        self.__init__(mdl);
+
+        for data, v in state["items"]:
+            self[mdl.unpack(data)] = v;
+
+    def __contains__(self, item):
+        return item.id in self.data;
+
+    def __getitem__(self, item):
+        return self.data[item.id];
+
+    def __setitem__(self, item, v):
+        self.data[item.id] = v;
+
+    def get(self, item, default=None):
+        """
+        Returns the value for a state [item], or [default] if it has none.
+        """
+        return self.data.get(item.id, default);
+
+    def pop(self, item, default=None):
+        """
+        Remove a state [item], and return its value (or [default] if it has
+         none).
+        """
+        return self.data.pop(item.id, default);
@@ -1,11 +1,33 @@
 #include <assert.h>
 #include <stdlib.h>
+#include <string.h>
 #include "loader.h"
 
 #define _sizeof(a, b) (sizeof(a)/sizeof(b))
 
+// callbacks into Python, by index in the handler table of pins.Wrapper
+enum _wrapperCall{
+  _CALL_SET_ACTION_COUNT,
+  _CALL_SET_ACTION_LABEL,
+  _CALL_SET_STATE_LENGTH,
+  _CALL_SET_STATE_SLOT_NAME,
+  _CALL_SET_INITIAL_STATE,
+  _CALL_SET_NEXT_STATES_FN,
+  _CALL_SET_STATE_LABEL_COUNT,
+  _CALL_SET_STATE_LABEL_NAME,
+  _CALL_SET_MATRIX,
+  _CALL_SET_EDGE_LABEL_COUNT,
+  _CALL_EDGE_LABELS_SET_NAME,
+  _CALL_EDGE_LABELS_SET_TYPE,
+  _CALL_SET_GUARDS,
+  _CALL_SET_GUARDS_ALL,
+  _CALL_ADD_TYPE,
+  _CALL_TYPES_SET_FORMAT,
+  _CALL_TYPES_ADD_CHUNK
+};
+
 // callback into Python with arbitrary arguments
-typedef void (*_wrapperCallback)(char *kind, int argc, void **argv);
+typedef void (*_wrapperCallback)(int kind, int argc, void **argv);
 _wrapperCallback _pyCallback;
 
 void _wrapperInit(_wrapperCallback fn){
@@ -13,6 +35,19 @@ void _wrapperInit(_wrapperCallback fn){
   _pyCallback = fn;
 }
 
+// calls forwarded to Python, one bit per enum _wrapperCall
+unsigned long long _forward = ~0ull;
+
+void _wrapperSetForward(unsigned long long mask){
+  // Only forward the calls in [mask] to Python; others are ignored.
+  _forward = mask;
+}
+
+static void _wrapperCall(enum _wrapperCall kind, int argc, void **argv){
+  if(_forward & (1ull << kind))
+    (*_pyCallback)(kind, argc, argv);
+}
+
 StateLabelLongFn _stateLabelLong = NULL;
 StateLabelAllFn _stateLabelAll = NULL;
 
@@ -49,28 +84,136 @@ int _wrapperGetStateLabels(int *dst, int dmax, void *src){
   return 0;
 }
 
+// Successor generation
+struct TransitionInfo{
+  int *labels;
+  int group;
+  int por_proviso;
+};
+
+typedef void (*NextStateCb)(void *ctx, struct TransitionInfo *ti, int *dst,
+                            int *cpy);
+typedef int (*NextStateLongFn)(void *model, int group, int *src,
+                               NextStateCb cb, void *ctx);
+typedef int (*NextStateAllFn)(void *model, int *src, NextStateCb cb,
+                              void *ctx);
+
+NextStateLongFn _nextStateLong = NULL;
+NextStateAllFn _nextStateAll = NULL;
+
+struct _wrapperBatch{
+  int *dst;
+  int *groups;
+  int length;
+  int dmax;
+  int n;
+  unsigned char *select;
+};
+
+static void _wrapperCollect(void *ctx, struct TransitionInfo *ti, int *dst,
+                            int *cpy){
+  // Append successor [dst] and its group to the batch [ctx]. Successors
+  //  beyond its capacity are only counted.
+  struct _wrapperBatch *batch = ctx;
+  if(batch->select!=NULL && !batch->select[ti->group])
+    return;
+
+  if(batch->n < batch->dmax){
+    memcpy(batch->dst + (size_t)batch->n * batch->length, dst,
+           batch->length * sizeof(int));
+    batch->groups[batch->n] = ti->group;
+  }
+  batch->n++;
+}
+
+int _wrapperNextStates(int *dst, int *groups, int dmax, int length,
+                       int *src){
+  // Puts all successors of the [length]-slot state [src] back-to-back in
+  //  the array [dst], and the group of each in the array [groups], for at
+  //  most [dmax] successors.
+  // Returns the number of successors, which may exceed [dmax]; if so, the
+  //  call must be repeated with larger arrays.
+  struct _wrapperBatch batch = {dst, groups, length, dmax, 0, NULL};
+  (*_nextStateAll)(NULL, src, &_wrapperCollect, &batch);
+  return batch.n;
+}
+
+int _wrapperNextStatesFor(int *dst, int *groups, int dmax, int length,
+                          int *src, unsigned char *select, int count){
+  // Like _wrapperNextStates, but only for the successors of the groups
+  //  g < [count] for which [select][g] is set. Each of these groups is
+  //  called separately if the model has a per-group next-state function;
+  //  otherwise, the successors of other groups are dropped.
+  struct _wrapperBatch batch = {dst, groups, length, dmax, 0, select};
+  if(_nextStateLong==NULL){
+    (*_nextStateAll)(NULL, src, &_wrapperCollect, &batch);
+    return batch.n;
+  }
+
+  for(int g = 0; g < count; g++)
+    if(select[g])
+      (*_nextStateLong)(NULL, g, src, &_wrapperCollect, &batch);
+  return batch.n;
+}
+
+int _wrapperGetStateLabelMasks(unsigned char *dst, int stride, int dmax,
+                               int length, int *src, int n){
+  // For each of the [n] [length]-slot states back-to-back in [src], puts a
+  //  bitmask of its [dmax] state labels in [stride] bytes of [dst].
+  // Returns 0, or -1 if the label buffer cannot be allocated.
+  int *labels = NULL;
+  if(_stateLabelAll!=NULL){
+    labels = malloc(dmax * sizeof(int));
+    if(labels==NULL)
+      return -1;
+  }
+
+  memset(dst, 0, (size_t)n * stride);
+  for(int k = 0; k < n; k++){
+    int *s = src + (size_t)k * length;
+    unsigned char *d = dst + (size_t)k * stride;
+
+    if(labels!=NULL)
+      (*_stateLabelAll)(NULL, s, labels);
+
+    for(int i = 0; i < dmax; i++){
+      int v = 0;
+      if(labels!=NULL)
+        v = labels[i];
+      else if(_stateLabelLong!=NULL)
+        v = (*_stateLabelLong)(NULL, i, s);
+
+      if(v!=0)
+        d[i >> 3] |= 1 << (i & 7);
+    }
+  }
+
+  free(labels);
+  return 0;
+}
+
 // Miscellaneous functions for loader use
 void _wrapperSetActionCount(int i){
   void *args[] = {&i};
-  (*_pyCallback)("setActionCount", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_ACTION_COUNT, _sizeof(args, void *), args);
 }
 
 void _wrapperSetActionLabel(int i){
   void *args[] = {&i};
-  (*_pyCallback)("setActionLabel", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_ACTION_LABEL, _sizeof(args, void *), args);
 }
 
 // State functions
 void lts_type_set_state_length(void *type, int length){
   // Set state length to [length].
   void *args[] = {&length};
-  (*_pyCallback)("setStateLength", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_STATE_LENGTH, _sizeof(args, void *), args);
 }
 
 void lts_type_set_state_name(void *type, int i, char *name){
   // Set the name of state slot [i] to [name].
   void *args[] = {&i, name};
-  (*_pyCallback)("setStateSlotName", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_STATE_SLOT_NAME, _sizeof(args, void *), args);
 }
 
 void lts_type_set_state_typeno(void *type, int i, int tid){
@@ -80,31 +223,34 @@ void lts_type_set_state_typeno(void *type, int i, int tid){
 void GBsetInitialState(void *model, int *initial){
   // Set the initial state to [initial].
   void *args[] = {initial};
-  (*_pyCallback)("setInitialState", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_INITIAL_STATE, _sizeof(args, void *), args);
 }
 
 void GBsetNextStateShort(void *model, void (*fn)()){
 }
 
 void GBsetNextStateLong(void *model, void (*fn)()){
+  // Set the per-group next-state function to [fn].
+  _nextStateLong = (NextStateLongFn)fn;
 }
 
 void GBsetNextStateAll(void *model, void (*fn)()){
   // Set the next-state function to [fn].
-  (*_pyCallback)("setNextStatesFn", 1, (void *)&fn);
+  _nextStateAll = (NextStateAllFn)fn;
+  _wrapperCall(_CALL_SET_NEXT_STATES_FN, 1, (void *)&fn);
 }
 
 // State label functions
 void lts_type_set_state_label_count(void *type, int n){
   // Set the amount of state labels to [n].
   void *args[] = {&n};
-  (*_pyCallback)("setStateLabelCount", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_STATE_LABEL_COUNT, _sizeof(args, void *), args);
 }
 
 void lts_type_set_state_label_name(void *type, int i, char *name){
   // Set the name of state label [i] to [name].
   void *args[] = {&i, name};
-  (*_pyCallback)("setStateLabelName", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_STATE_LABEL_NAME, _sizeof(args, void *), args);
 }
 
 void lts_type_set_state_label_typeno(void *type, int i, int n){
@@ -128,20 +274,20 @@ void GBsetStateLabelsAll(void *model, StateLabelAllFn fn){
 void GBsetStateLabelInfo(void *model, struct Matrix *mtx){
   // Set state label dependency matrix to [mtx] (state labels x slots).
   void *args[] = {"guardTest", mtx};
-  (*_pyCallback)("setMatrix", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_MATRIX, _sizeof(args, void *), args);
 }
 
 // Edge label functions
 void lts_type_set_edge_label_count(void *type, int n){
   // Set the amount of edge labels to [n].
   void *args[] = {&n};
-  (*_pyCallback)("setEdgeLabelCount", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_EDGE_LABEL_COUNT, _sizeof(args, void *), args);
 }
 
 void lts_type_set_edge_label_name(void *type, int i, char *name){
   // Set the name of edge label [i] to [name].
   void *args[] = {&i, name};
-  (*_pyCallback)("edgeLabels.#.setName", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_EDGE_LABELS_SET_NAME, _sizeof(args, void *), args);
 }
 
 void lts_type_set_edge_label_type(void *type, int i, char *name){
@@ -151,76 +297,76 @@ void lts_type_set_edge_label_type(void *type, int i, char *name){
 void lts_type_set_edge_label_typeno(void *type, int i, int tid){
   // Set the type of edge label [i] to the type identified by [tid].
   void *args[] = {&i, &tid};
-  (*_pyCallback)("edgeLabels.#.setType", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_EDGE_LABELS_SET_TYPE, _sizeof(args, void *), args);
 }
 
 // Affect set functions
 void GBsetDMInfoRead(void *model, struct Matrix *mtx){
   // Set read dependency matrix to [mtx] (actions x slots).
   void *args[] = {"actionRead", mtx};
-  (*_pyCallback)("setMatrix", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_MATRIX, _sizeof(args, void *), args);
 }
 
 void GBsetDMInfoMayWrite(void *model, struct Matrix *mtx){
   // Set write dependency matrix to [mtx] (actions x slots).
   void *args[] = {"actionMayWrite", mtx};
-  (*_pyCallback)("setMatrix", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_MATRIX, _sizeof(args, void *), args);
 }
 
 void GBsetDMInfoMustWrite(void *model, struct Matrix *mtx){
   // Set write dependency matrix to [mtx] (actions x slots).
   void *args[] = {"actionMustWrite", mtx};
-  (*_pyCallback)("setMatrix", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_MATRIX, _sizeof(args, void *), args);
 }
 
 void GBsetDMInfo(void *model, struct Matrix *mtx){
   // Set read/write dependency matrix to [mtx] (actions x slots).
   void *args[] = {"actionAccess", mtx};
-  (*_pyCallback)("setMatrix", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_MATRIX, _sizeof(args, void *), args);
 }
 
 // Guard functions
 void GBsetGuard(void *model, int aid, struct Guard *guard){
   // Set [guards] for an individual action [aid].
   void *args[] = {&aid, guard};
-  (*_pyCallback)("setGuards", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_GUARDS, _sizeof(args, void *), args);
 }
 
 void GBsetGuardsInfo(void *model, struct Guard **guards){
   // Set [guards] for all actions.
   void *args[] = {guards};
-  (*_pyCallback)("setGuardsAll", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_GUARDS_ALL, _sizeof(args, void *), args);
 }
 
 // Reduction information functions
 void GBsetDoNotAccordInfo(void *model, struct Matrix *mtx){
   // Set do-not-accord matrix to [mtx] (actions x actions).
   void *args[] = {"noAccord", mtx};
-  (*_pyCallback)("setMatrix", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_MATRIX, _sizeof(args, void *), args);
 }
 
 void GBsetGuardNESInfo(void *model, struct Matrix *mtx){
   // Set guard NES matrix to [mtx] (state labels x actions).
   void *args[] = {"guardNES", mtx};
-  (*_pyCallback)("setMatrix", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_MATRIX, _sizeof(args, void *), args);
 }
 
 void GBsetGuardNDSInfo(void *model, struct Matrix *mtx){
   // Set guard NDS matrix to [mtx] (state labels x actions).
   void *args[] = {"guardNDS", mtx};
-  (*_pyCallback)("setMatrix", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_MATRIX, _sizeof(args, void *), args);
 }
 
 void GBsetCommutesInfo(void *model, struct Matrix *mtx){
   // Set commutation matrix to [mtx] (actions x actions).
   void *args[] = {"commute", mtx};
-  (*_pyCallback)("setMatrix", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_MATRIX, _sizeof(args, void *), args);
 }
 
 void GBsetGuardCoEnabledInfo(void *model, struct Matrix *mtx){
   // Set guard co-enabled matrix to [mtx] (state labels x state labels).
   void *args[] = {"coenable", mtx};
-  (*_pyCallback)("setMatrix", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_SET_MATRIX, _sizeof(args, void *), args);
 }
 
 // Type functions
@@ -231,13 +377,13 @@ int lts_type_add_type(void *type, char *name, void *ptr){
   // Add a new type with a given [name].
   static int tid = 0;
   void *args[] = {&tid, name};
-  (*_pyCallback)("addType", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_ADD_TYPE, _sizeof(args, void *), args);
   return tid++;
 }
 
 void lts_type_set_format(void *type, int tid, int n){
   void *args[] = {&tid, &n};
-  (*_pyCallback)("types.#.setFormat", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_TYPES_SET_FORMAT, _sizeof(args, void *), args);
 }
 
 void lts_type_validate(void *type){
@@ -250,7 +396,7 @@ void GBchunkPut(void *model, int tid, struct Chunk chunk){
   // Add a chunk string [chunk] to the type identified by [tid].
   assert(chunk.str[chunk.len]=='\0');
   void *args[] = {&tid, chunk.str};
-  (*_pyCallback)("types.#.addChunk", _sizeof(args, void *), args);
+  _wrapperCall(_CALL_TYPES_ADD_CHUNK, _sizeof(args, void *), args);
 }
 
 void pins_chunk_put(void *model, int tid, struct Chunk chunk){
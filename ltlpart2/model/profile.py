@@ -0,0 +1,184 @@
+import json;
+import sys;
+import time;
+
+clock = time.perf_counter;
+
+class Profile(object):
+    """
+    Exploration profile object.
+
+    Assign a profile to the [profile] attribute of a model to collect counters
+     and timers during reach() and hasCycle(). If [output] is given (a path,
+     or "-" for stdout), a JSON summary is written to it at the end of each
+     run.
+    Timers are exclusive: time recorded under another timer during a timed
+     call (such as the label evaluation in the successor function of a Büchi
+     product) is not counted again for that call.
+    """
+    def __init__(self, output=None):
+        self.output = output;
+
+        self.timers = {};
+        self.calls = {};
+
+        self.states = 0;
+        self.transitions = 0;
+        self.pruned = 0;
+        self.fanout = {};
+        self.depth = 0;
+
+        self.elapsed = 0.0;
+        self._start = None;
+
+        # total time recorded by all timers, to exclude nested timers
+        self._timed = 0.0;
+
+    def start(self):
+        """
+        Mark the start of a run.
+        """
+        self._start = clock();
+
+    def finish(self):
+        """
+        Mark the end of a run, and write the summary to [output].
+        """
+        if(self._start is not None):
+            self.elapsed += clock() - self._start;
+            self._start = None;
+
+        if(self.output is None):
+            return;
+
+        if(self.output=="-"):
+            self.dump(sys.stdout);
+            return;
+
+        with open(self.output, "w") as f:
+            self.dump(f);
+
+    def time(self, name, dt, n=1):
+        """
+        Add [dt] seconds spent in [n] calls to the timer [name].
+        """
+        self.timers[name] = self.timers.get(name, 0.0) + dt;
+        self.calls[name] = self.calls.get(name, 0) + n;
+        self._timed += dt;
+
+    def visit(self, succ, depth):
+        """
+        Count a state with [succ] successors, at a search depth of [depth]
+         states (the length of the path to it).
+        """
+        self.states += 1;
+        self.transitions += succ;
+        self.fanout[succ] = self.fanout.get(succ, 0) + 1;
+        if(depth > self.depth):
+            self.depth = depth;
+
+    def prune(self, n):
+        """
+        Count [n] actions pruned by sleep sets (or explored again, if
+         negative).
+        """
+        self.pruned += n;
+
+    def nextStates(self, fn, name="nextStates"):
+        """
+        Returns a version of the successor function [fn] that is timed under
+         [name], excluding the timers recorded within it.
+        """
+        def nextStates(*args):
+            it = iter(fn(*args));
+            dt, n = 0.0, 0;
+            while True:
+                t, timed = clock(), self._timed;
+                try:
+                    v = next(it);
+                except StopIteration:
+                    dt += clock() - t - (self._timed - timed);
+                    self.time(name, dt, n + 1);
+                    return;
+
+                dt += clock() - t - (self._timed - timed);
+                n += 1;
+                yield v;
+
+        return nextStates;
+
+    def lookups(self, obj, name="lookup"):
+        """
+        Returns a proxy for a set or dict [obj] whose accesses are timed
+         under [name].
+        """
+        return _Lookups(self, obj, name);
+
+    def summary(self):
+        """
+        Returns a dict summarizing this profile.
+        """
+        elapsed = self.elapsed;
+        if(self._start is not None):
+            elapsed += clock() - self._start;
+
+        return {
+            "elapsed": elapsed,
+            "states": self.states,
+            "transitions": self.transitions,
+            "pruned": self.pruned,
+            "statesPerSec": self.states / elapsed if elapsed else 0.0,
+            "transitionsPerSec":
+                self.transitions / elapsed if elapsed else 0.0,
+            "peakDepth": self.depth,
+            "timers": dict(self.timers),
+            "calls": dict(self.calls),
+            "fanout": {str(k): v for k, v in sorted(self.fanout.items())},
+        };
+
+    def dump(self, f):
+        """
+        Write the summary of this profile as JSON to a file [f].
+        """
+        json.dump(self.summary(), f, indent=2);
+        f.write("\n");
+
+class _Lookups(object):
+    """
+    Proxy for a set or dict, timing each lookup and insertion.
+    """
+    def __init__(self, profile, obj, name):
+        self.profile = profile;
+        self.obj = obj;
+        self.name = name;
+
+    def __getattr__(self, attr):
+        return getattr(self.obj, attr);
+
+    def __len__(self):
+        return len(self.obj);
+
+    def __iter__(self):
+        return iter(self.obj);
+
+    def __contains__(self, item):
+        t = clock();
+        v = item in self.obj;
+        self.profile.time(self.name, clock() - t);
+        return v;
+
+    def add(self, item):
+        t = clock();
+        self.obj.add(item);
+        self.profile.time(self.name, clock() - t);
+
+    def get(self, item, default=None):
+        t = clock();
+        v = self.obj.get(item, default);
+        self.profile.time(self.name, clock() - t);
+        return v;
+
+    def __setitem__(self, item, v):
+        t = clock();
+        self.obj[item] = v;
+        self.profile.time(self.name, clock() - t);
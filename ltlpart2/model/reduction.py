@@ -1,27 +1,137 @@
+import collections;
 import copy;
 import types;
 
 from . import model;
 
-def POR(mdl):
+class StubbornCache(object):
     """
-    Returns a POR-reduced version of the model [mdl].
+    Cache of stubborn sets by state label valuation.
+
+    With static relations, the stubborn set of a state only depends on the
+     state labels that hold in it (its labelMask), so states with the same
+     valuation share their stubborn set. The cache maps label bitmasks to
+     stubborn sets (as bitmasks, see Model.stubbornMask), and holds at most
+     [capacity] entries, evicting the least recently used entry when full.
+    """
+    def __init__(self, model, capacity=1 << 16):
+        """
+        Create a stubborn set cache for a [model] with a given [capacity] in
+         entries.
+        """
+        self.model = model;
+        self.capacity = capacity;
+        self.entries = collections.OrderedDict();
+
+        self.hits = 0;
+        self.misses = 0;
+        self.evictions = 0;
+
+    def __len__(self):
+        return len(self.entries);
+
+    def stubbornMask(self, src):
+        """
+        Returns the (enabled) stubborn set for a state [src] as a bitmask of
+         action bits.
+        """
+        entries = self.entries;
+        key = src.labelMask;
+        v = entries.get(key, None);
+        if(v is not None):
+            self.hits += 1;
+            entries.move_to_end(key);
+            return v;
+
+        self.misses += 1;
+        v = self.model.stubbornMask(src);
+        entries[key] = v;
+        if(len(entries) > self.capacity):
+            entries.popitem(last=False);
+            self.evictions += 1;
+        return v;
+
+    def report(self):
+        """
+        Returns a dict with the statistics of this cache.
+        """
+        n = self.hits + self.misses;
+        return {
+            "entries": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / n if n else 0.0,
+            "evictions": self.evictions,
+        };
+
+def POR(mdl, cache=1 << 16, sleep=False):
     """
+    Returns a POR-reduced version of the model [mdl]. Unless [cache] is None,
+     stubborn sets are cached by label valuation in a StubbornCache of that
+     capacity, available as the [stubbornCache] attribute of the result. If
+     [sleep] is set, the reduced model also prunes transitions with sleep sets
+     (see Model.sleepSets): only the actions of the stubborn set that are
+     not asleep are explored. Sleep sets are only used by reach(); they are
+     not sound for the cycle search of a Büchi product (see
+     buchi.Product.hasCycle), which refuses such a model.
+    """
+    stubbornMask = mdl.stubbornMask;
+    if(cache is not None):
+        stubbornMask = StubbornCache(mdl, cache).stubbornMask;
+
     def nextStates(self, src):
         """
         Returns for each POR-reduced successor state of [src] in a [model] a
          tuple consisting of the state object and the action used to get there.
         """
         # stubborn already intersects with enabled
-        stubborn = self.stubborn(src);
+        stubborn = stubbornMask(src);
 
-        for s, t in self.nextStates(src):
-            # return only those actions in stubborn set
-            if(t in stubborn):
-                yield (s, t);
+        # generate only the successors of actions in the stubborn set
+        yield from self.nextStatesFor(src, stubborn);
+
+    def nextStatesFor(self, src, mask):
+        """
+        Returns for each POR-reduced successor state of [src] in a [model] by
+         one of the actions in the bitmask [mask] a tuple consisting of the
+         state object and the action used to get there.
+        """
+        return self.nextStatesFor(src, stubbornMask(src) & mask);
+
+    # the copy shares the relations (and the record of the action scores
+    #  they keep) with the original, so compute them first
+    mdl.relations;
 
     # create shallow copy and replace nextStates
     m = copy.copy(mdl);
     # XXX: new function bound to original object!
     m.nextStates = types.MethodType(nextStates, mdl);
+    m.nextStatesFor = types.MethodType(nextStatesFor, mdl);
+    m.stubbornCache = stubbornMask.__self__ if cache is not None else None;
+    m.sleep = sleep;
+
+    m.__class__ = _reduced(type(mdl));
+    m.reduction = (mdl, cache, sleep);
     return m;
+
+class Reduced(object):
+    """
+    Base class of the models returned by POR(), which are pickled (e.g. for
+     the workers of parallel.Reach) as the reduction of the original model,
+     as the replaced methods cannot be pickled themselves.
+    """
+    def __reduce__(self):
+        return (POR, self.reduction);
+
+# subclasses of Reduced for each model class
+_types = {};
+
+def _reduced(cls):
+    """
+    Returns the subclass of Reduced for POR-reduced models of the class [cls].
+    """
+    t = _types.get(cls, None);
+    if(t is None):
+        t = _types[cls] = type(cls.__name__, (Reduced, cls), {});
+    return t;
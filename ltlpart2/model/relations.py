@@ -0,0 +1,261 @@
+import inspect;
+import time;
+
+from . import util;
+from .util import cached_property;
+
+clock = time.perf_counter;
+
+def _given(obj, name):
+    """
+    Returns whether the relation [name] of an action or label [obj] is given
+     (as a property, or by the model), instead of derived by default.
+    """
+    return not isinstance(inspect.getattr_static(obj, name), cached_property);
+
+def _mask(items):
+    """
+    Returns the bits of the actions or labels in [items] OR'ed together, or
+     None if [items] is None.
+    """
+    if(items is None):
+        return None;
+
+    mask = 0;
+    for v in items:
+        mask |= v.bit;
+    return mask;
+
+class Relations(object):
+    """
+    Static partial-order reduction relations of a model, as bitmasks.
+
+    The relations are computed together, for all actions and labels at once:
+     the coenable set of each action (over labels), the do-not-accord set of
+     each action and the enabling set of each action (over actions), and the
+     necessary enabling set of each label (over actions). Slot sets are
+     turned into bitmasks, and transposed into the actions reading and
+     writing each slot, so that each relation is one pass of integer ORs
+     over the actions or labels instead of a set operation per pair.
+    Relations given by the model (such as DNA or NES sets from a PINS model)
+     are used instead of being derived.
+
+    Each relation is a list indexed by action or label index (see
+     Model.AttrPool); an unknown relation is None. The guards of each action
+     ([guards]) and the actions guarded by each label ([guarded]) are kept
+     likewise.
+    """
+    def __init__(self, model):
+        """
+        Compute the relations of a [model].
+        """
+        self.model = model;
+        self.times = {};
+
+        acts = list(model.actions);
+        lbls = list(model.labels);
+        assert(all(v.index==i for i, v in enumerate(acts)));
+        assert(all(v.index==i for i, v in enumerate(lbls)));
+        self.actions, self.labels = acts, lbls;
+
+        # slots are numbered in order of appearance
+        self._slots = {};
+
+        # all actions and labels, the guards of each action, and the actions
+        #  guarded by each label
+        self.every = (1 << len(acts)) - 1;
+        self.everyLabel = (1 << len(lbls)) - 1;
+        self.guards = [act.guardMask for act in acts];
+        self.guarded = [0] * len(lbls);
+        for act in acts:
+            for g in act.guards:
+                self.guarded[g.index] |= act.bit;
+
+        # enabled actions and actions with a zero score (see Model.stubborn)
+        #  at the last call to Model.enabled, as bitmasks; None before the
+        #  first call. The scores are kept on the actions, which all copies
+        #  of the model share, and so is this object.
+        self.scored = None;
+
+        for name in ("coenable", "DNA", "NES", "enables"):
+            t = clock();
+            getattr(self, "_" + name)();
+            self.times[name] = clock() - t;
+
+        prof = model.profile;
+        if(prof is not None):
+            for name, dt in self.times.items():
+                prof.time("relations." + name, dt);
+
+    def _slotMask(self, slots):
+        """
+        Returns the bits of the slots in [slots] OR'ed together, or None if
+         [slots] is None.
+        """
+        if(slots is None):
+            return None;
+
+        ids = self._slots;
+        mask = 0;
+        for s in slots:
+            mask |= 1 << ids.setdefault(s, len(ids));
+        return mask;
+
+    def _coenable(self):
+        """
+        Compute the coenable set of each action: the labels coenabled with
+         any of its guards.
+        """
+        res = [];
+        for act in self.actions:
+            mask = 0;
+            for g in act.guards:
+                m = _mask(g.coenable);
+                if(m is None):
+                    mask = None;
+                    break;
+                mask |= m;
+            res.append(mask);
+        self.coenable = res;
+
+    def _DNA(self):
+        """
+        Compute the do-not-accord set of each action (see Action.accords).
+        """
+        acts = self.actions;
+        every = self.every;
+
+        # slot masks of each action
+        vars, writes = [], [];
+        for act in acts:
+            t = None;
+            if(all(g.tests is not None for g in act.guards)):
+                t = 0;
+                for g in act.guards:
+                    t |= self._slotMask(g.tests);
+            r = self._slotMask(act.reads);
+            w = self._slotMask(act.writes);
+
+            v = None;
+            if(t is not None and r is not None and w is not None):
+                v = t | r | w;
+            vars.append(v);
+            writes.append(w);
+
+        # transpose: actions using and writing each slot, for actions
+        #  with variables
+        users, writers = {}, {};
+        haveVars = 0;
+        for act, v, w in zip(acts, vars, writes):
+            if(not v):
+                continue;
+            haveVars |= act.bit;
+            for s in util.bits(v):
+                users[s] = users.get(s, 0) | act.bit;
+            for s in util.bits(w):
+                writers[s] = writers.get(s, 0) | act.bit;
+
+        guarded = self.guarded;
+        res = [];
+        for i, act in enumerate(acts):
+            if(_given(act, "DNA")):
+                res.append(_mask(act.DNA));
+                continue;
+
+            accord = 0;
+            # accordance based on shared variables: neither writes a
+            #  variable of the other
+            v = vars[i];
+            if(v):
+                conflict = 0;
+                for s in util.bits(writes[i]):
+                    conflict |= users[s];
+                for s in util.bits(v):
+                    conflict |= writers.get(s, 0);
+                accord |= haveVars & ~conflict;
+
+            # accordance based on co-enabledness: no guard of the other is
+            #  coenabled with a guard of this action
+            c = self.coenable[i];
+            if(c):
+                hit = 0;
+                for j in util.bits(c):
+                    hit |= guarded[j];
+                accord |= every & ~hit;
+
+            # accordance based on commutation
+            if(act.commute):
+                accord |= _mask(act.commute);
+
+            res.append(every & ~accord);
+        self.dna = res;
+
+    def _NES(self):
+        """
+        Compute the necessary enabling set of each label: the actions writing
+         a slot it tests.
+        """
+        writers = {};
+        for act in self.actions:
+            for s in util.bits(self._slotMask(act.writes) or 0):
+                writers[s] = writers.get(s, 0) | act.bit;
+
+        res = [];
+        for lbl in self.labels:
+            if(_given(lbl, "NES")):
+                res.append(_mask(lbl.NES));
+                continue;
+
+            t = self._slotMask(lbl.tests);
+            if(t is None):
+                res.append(None);
+                continue;
+
+            mask = 0;
+            for s in util.bits(t):
+                mask |= writers.get(s, 0);
+            res.append(mask);
+        self.nes = res;
+
+    def _enables(self):
+        """
+        Compute the enabling set of each action: the labels whose NES it is
+         in.
+        """
+        res = [0] * len(self.actions);
+        for lbl, mask in zip(self.labels, self.nes):
+            for i in util.bits(mask or 0):
+                res[i] |= lbl.bit;
+        self.enables = res;
+
+    @cached_property
+    def independent(self):
+        """
+        Returns for each action a bitmask of the actions it accords with
+         mutually: neither is in the DNA of the other.
+        """
+        dnaT = [0] * len(self.actions);
+        for i, mask in enumerate(self.dna):
+            for j in util.bits(mask):
+                dnaT[j] |= 1 << i;
+
+        return [self.every & ~(mask | dnaT[i])
+                for i, mask in enumerate(self.dna)];
+
+    def report(self):
+        """
+        Returns a dict with the sizes of the relations, and the time taken to
+         compute each.
+        """
+        def pairs(rel):
+            return sum(bin(m).count("1") for m in rel if m is not None);
+
+        return {
+            "actions": len(self.actions),
+            "labels": len(self.labels),
+            "DNA": pairs(self.dna),
+            "NES": pairs(self.nes),
+            "coenable": pairs(self.coenable),
+            "enables": pairs(self.enables),
+            "seconds": dict(self.times),
+        };
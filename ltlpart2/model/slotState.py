@@ -41,7 +41,9 @@ class SlotState(model.State):
     def __eq__(self, other):
         same = (self.slots==other.slots);
         same = same or super().__eq__(other);
-        return (self.names is other.names) and same;
+        # names may be distinct (but equal) lists after unpickling
+        names = (self.names is other.names) or (self.names==other.names);
+        return names and same;
 
     def clone(self):
         """
@@ -7,13 +7,23 @@ import collections.abc;
 class TreeSet(collections.abc.MutableSet):
     """
     Tree-based state set object.
+
+    Each node of the tree stores pairs of indices into its two child nodes in
+     a table, together with a hash index from each pair to its position in
+     that table. The shape of the tree is fixed by the length of the first
+     tuple added; all tuples in a set must have the same length.
     """
     def __init__(self):
         self.data = [];
+        self.index = {};
         self.out = [None, None];
 
+        # amount of tuples in this set (only maintained for the root)
+        self.count = 0;
+        self.length = None;
+
     def __len__(self):
-        return sum(1 for _ in iter(self));
+        return self.count;
 
     def _get(self, pair):
         """
@@ -28,88 +38,135 @@ class TreeSet(collections.abc.MutableSet):
         out, hi = self.out[1], pair[1];
         if(out is not None):
             hi = out._get(out.data[hi]);
+        elif(self.length==1):
+            hi = ();
         else:
             hi = (hi,);
 
         return lo + hi;
 
     def __iter__(self):
-        for pair in self.data:
+        # the root index only holds pairs that have not been discarded
+        for pair in list(self.index):
             yield self._get(pair);
 
     def _split(self, item):
         """
-        Splits a given tuple [item].
+        Splits a given tuple [item] into the (lo, hi) halves for each child.
         """
-        if(self.out[0] is None):
-            return item[0], item[1:];
-        if(self.out[1] is None):
-            return item[:-1], item[-1];
-
         l = (len(item) + 1) // 2;
         return item[:l], item[l:];
 
-    def _index(self, item):
+    def _grow(self, length):
         """
-        Returns the index a given tuple [item] can be found at.
+        Create the child nodes for tuples of a given [length].
+        """
+        self.length = length;
+        lo = (length + 1) // 2;
+        hi = length - lo;
+
+        if(lo > 1):
+            self.out[0] = TreeSet();
+            self.out[0]._grow(lo);
+        if(hi > 1):
+            self.out[1] = TreeSet();
+            self.out[1]._grow(hi);
+
+    def _find(self, item):
+        """
+        Returns the index a given tuple [item] can be found at,
+         or None if it is not in this set.
         """
-        if(self.out[0] is None and self.out[1] is None):
-            return self.data.index(item);
-
         lo, hi = self._split(item);
-        if(self.out[0] is not None):
-            lo = self.out[0]._index(lo);
-        if(self.out[1] is not None):
-            hi = self.out[1]._index(hi);
+        out = self.out[0];
+        if(out is not None):
+            lo = out._find(lo);
+            if(lo is None):
+                return None;
+        else:
+            lo = lo[0];
 
-        return self.data.index((lo, hi));
+        out = self.out[1];
+        if(out is not None):
+            hi = out._find(hi);
+            if(hi is None):
+                return None;
+        else:
+            hi = hi[0] if hi else None;
+
+        return self.index.get((lo, hi), None);
 
     def __contains__(self, item):
         item = tuple(item);
-        try:
-            i = self._index(item);
-            return True;
-        except ValueError as e:
+        if(self.length is None or len(item)!=self.length):
             return False;
 
+        return self._find(item) is not None;
+
     def _add(self, item):
         """
-        Add a given tuple [item] to this set.
+        Find or insert a given tuple [item] in this set.
+        Returns the index of the tuple.
         """
-        l = (len(item) + 1) // 2;
-        lo, hi = item[:l], item[l:];
-
-        if(len(lo) > 1):
-            if(self.out[0] is None):
-                self.out[0] = TreeSet();
-            lo = self.out[0]._add(lo);
+        lo, hi = self._split(item);
+        out = self.out[0];
+        if(out is not None):
+            lo = out._add(lo);
         else:
             lo = lo[0];
 
-        if(len(hi) > 1):
-            if(self.out[1] is None):
-                self.out[1] = TreeSet();
-            hi = self.out[1]._add(hi);
+        out = self.out[1];
+        if(out is not None):
+            hi = out._add(hi);
         else:
-            hi = hi[0];
+            hi = hi[0] if hi else None;
 
         pair = (lo, hi);
-        try:
-            n = self.data.index(pair);
-        except ValueError:
+        n = self.index.get(pair, None);
+        if(n is None):
             n = len(self.data);
             self.data.append(pair);
+            self.index[pair] = n;
 
         return n;
 
+    def insert(self, item):
+        """
+        Find or insert a given state [item] in this set.
+        Returns whether the state was newly added.
+        """
+        item = tuple(item);
+        if(self.length is None):
+            self._grow(len(item));
+        assert(len(item)==self.length);
+
+        n = len(self.index);
+        self._add(item);
+        if(len(self.index)==n):
+            return False;
+
+        self.count += 1;
+        return True;
+
     def add(self, item):
         """
         Add a given state [item] to this set.
         """
-        self._add(tuple(item));
+        self.insert(item);
 
     def discard(self, item):
         """
         Remove a given state [item] from this set.
         """
-        raise NotImplementedError;
+        item = tuple(item);
+        if(self.length is None or len(item)!=self.length):
+            return;
+
+        n = self._find(item);
+        if(n is None):
+            return;
+
+        # only the root pair is removed; child nodes are shared between tuples
+        del self.index[self.data[n]];
+        self.data[n] = None;
+        self.count -= 1;
@@ -1,3 +1,5 @@
+import io;
+import pickle;
 import re;
 
 class cached_property(object):
@@ -15,6 +17,51 @@ class cached_property(object):
         obj.__dict__[self.__name__] = v;
         return v;
 
+def dumps(obj, refs):
+    """
+    Returns the pickled object [obj]. Objects in the list [refs] (such as
+     models) are pickled by their position in that list.
+    """
+    ids = {id(r): i for i, r in enumerate(refs)};
+
+    class Pickler(pickle.Pickler):
+        def persistent_id(self, o):
+            return ids.get(id(o), None);
+
+    buf = io.BytesIO();
+    Pickler(buf, pickle.HIGHEST_PROTOCOL).dump(obj);
+    return buf.getvalue();
+
+def loads(data, refs):
+    """
+    Returns the object pickled by dumps() in [data], with references to the
+     objects in the list [refs].
+    """
+    class Unpickler(pickle.Unpickler):
+        def persistent_load(self, i):
+            return refs[i];
+
+    return Unpickler(io.BytesIO(data)).load();
+
+def mix64(h):
+    """
+    Returns the splitmix64 finalizer of a 64-bit integer [h]: a 64-bit
+     integer in which each bit depends on all bits of [h].
+    """
+    h = (h ^ (h >> 30)) * 0xbf58476d1ce4e5b9 & 0xffffffffffffffff;
+    h = (h ^ (h >> 27)) * 0x94d049bb133111eb & 0xffffffffffffffff;
+    return h ^ (h >> 31);
+
+def bits(mask):
+    """
+    Returns the index of each set bit in an integer [mask], in increasing
+     order.
+    """
+    while mask:
+        low = mask & -mask;
+        yield low.bit_length() - 1;
+        mask ^= low;
+
 class _Tokenizer(type):
     def __init__(cls, name, bases, namespace, **kwds):
         if("_tokens" not in namespace):